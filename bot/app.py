@@ -9,10 +9,22 @@ from telegram.ext import Application, ApplicationBuilder, Defaults
 from config.config import settings
 from utils.logger import get_logger
 from bot.handlers import register_handlers
+from bot.services import get_notification_buffer
+from core.coordinator import get_coordinator
 from storage.bootstrap import init_storage
 
 LOGGER = get_logger(__name__)
 
+# uvloop заметно снижает накладные расходы event loop на I/O-bound
+# нагрузке; зависимость опциональна (недоступна на Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+else:
+    uvloop.install()
+    LOGGER.info("uvloop установлен как event loop policy")
+
 BOT_COMMANDS: List[BotCommand] = [
     # Команды для владельцев (в ЛС)
     BotCommand("mychats", "Управление чатами"),
@@ -29,7 +41,12 @@ def run_polling() -> None:
     LOGGER.info("▶️  Запуск бота (polling)…")
     
     init_storage()
-    
+
+    # Модели загружаются и прогреваются до первого апдейта: фабрика
+    # вызывает warm_up(), и первый реальный месседж не платит за ленивые
+    # аллокации sklearn/LightGBM
+    get_coordinator()
+
     app = (
         ApplicationBuilder()
         .token(settings.BOT_TOKEN)
@@ -43,6 +60,10 @@ def run_polling() -> None:
         """Выполняется после инициализации приложения"""
         if BOT_COMMANDS:
             await application.bot.set_my_commands(BOT_COMMANDS)
+        # Фоновый сброс буфера групповых уведомлений живёт в loop
+        # приложения; флашеру нужен только .bot, так что Application
+        # подходит в роли context
+        get_notification_buffer().start_flusher(application)
         LOGGER.info("Application готово.")
 
     app.post_init = post_init
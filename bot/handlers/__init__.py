@@ -4,6 +4,8 @@
 """
 from __future__ import annotations
 
+import re
+
 from telegram.ext import (
     Application,
     CallbackQueryHandler,
@@ -84,10 +86,11 @@ def register_handlers(app: Application) -> None:
     
     # 3. Callback handlers (от специфичных к общим)
     
-    # Setup callbacks
-    app.add_handler(CallbackQueryHandler(on_activate_initial_callback, pattern=r"^activate_initial:-?\d+$"))
-    app.add_handler(CallbackQueryHandler(on_restore_config_callback, pattern=r"^restore_config:-?\d+$"))
-    app.add_handler(CallbackQueryHandler(on_reset_config_callback, pattern=r"^reset_config:-?\d+$"))
+    # Setup callbacks: chat_id захватывается группой регулярки —
+    # handler читает context.matches вместо split по callback_data
+    app.add_handler(CallbackQueryHandler(on_activate_initial_callback, pattern=re.compile(r"^activate_initial:(-?\d+)$")))
+    app.add_handler(CallbackQueryHandler(on_restore_config_callback, pattern=re.compile(r"^restore_config:(-?\d+)$")))
+    app.add_handler(CallbackQueryHandler(on_reset_config_callback, pattern=re.compile(r"^reset_config:(-?\d+)$")))
     
     # Owner menu callbacks
     app.add_handler(CallbackQueryHandler(on_chat_menu_callback, pattern=r"^chat_menu:-?\d+$"))
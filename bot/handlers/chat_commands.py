@@ -11,11 +11,23 @@ from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from storage import get_storage
+from storage.postgres import Storage
 from utils.logger import get_logger
 
 LOGGER = get_logger(__name__)
 
 
+_STORAGE: Storage | None = None
+
+
+def _storage() -> Storage:
+    """Возвращает закэшированный handle на Storage (один lookup на модуль)."""
+    global _STORAGE
+    if _STORAGE is None:
+        _STORAGE = get_storage()
+    return _STORAGE
+
+
 async def _is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Проверяет, является ли пользователь администратором чата."""
     if not update.effective_user or not update.effective_chat:
@@ -47,7 +59,7 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         )
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(update.effective_chat.id)
     
     if not chat_config:
@@ -113,7 +125,7 @@ async def cmd_pause(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(update.effective_chat.id)
     
     if not chat_config:
@@ -162,7 +174,7 @@ async def cmd_resume(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         )
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(update.effective_chat.id)
     
     if not chat_config:
@@ -237,7 +249,7 @@ async def cmd_test(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     import hashlib
     
     coordinator = get_coordinator()
-    storage = get_storage()
+    storage = _storage()
     
     try:
         chat_config = storage.chat_configs.get_by_chat_id(update.effective_chat.id)
@@ -548,7 +560,7 @@ async def cmd_link_moderator(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     # Сохранение привязки
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     
     if not chat_config:
@@ -9,18 +9,27 @@ from telegram import Message, Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
-from core.coordinator import FilterCoordinator
+from core.coordinator import FilterCoordinator, get_coordinator
 from core.types import Action, AnalysisResult
-from filters.keyword import KeywordFilter
-from filters.tfidf import TfidfFilter
-from filters.pattern import PatternClassifier
 from storage import get_storage, ChatConfig
+from storage.postgres import Storage
 from storage.interfaces import ModerationEventInput
 from bot.services import get_rate_limiter, send_individual_notification
 from utils.logger import get_logger
 
 LOGGER = get_logger(__name__)
 
+
+_STORAGE: Storage | None = None
+
+
+def _storage() -> Storage:
+    """Возвращает закэшированный handle на Storage (один lookup на модуль)."""
+    global _STORAGE
+    if _STORAGE is None:
+        _STORAGE = get_storage()
+    return _STORAGE
+
 # Глобальные компоненты (инициализируются один раз)
 _coordinator: FilterCoordinator | None = None
 _INITIALIZED = False
@@ -29,20 +38,16 @@ _INITIALIZED = False
 def _ensure_initialized() -> None:
     """Инициализация фильтров и координатора (один раз при старте)."""
     global _coordinator, _INITIALIZED
-    
+
     if _INITIALIZED:
         return
-    
-    keyword_filter = KeywordFilter()
-    tfidf_filter = TfidfFilter()
-    pattern_filter = PatternClassifier()
-    
-    _coordinator = FilterCoordinator(
-        keyword_filter=keyword_filter,
-        tfidf_filter=tfidf_filter,
-        pattern_filter=pattern_filter,
-    )
-    
+
+    # Единственный координатор на процесс: invalidate_whitelist() из
+    # owner_actions бьёт в тот же _wl_cache, что обслуживает сообщения,
+    # а warm_up() фабрики греет именно горячий путь — отдельный стек
+    # фильтров здесь собирал бы вторые копии моделей
+    _coordinator = get_coordinator()
+
     _INITIALIZED = True
     LOGGER.info("Moderation filters initialized")
 
@@ -69,7 +74,7 @@ async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     if msg.chat.type == "private":
         return
     
-    storage = get_storage()
+    storage = _storage()
     
     chat_config = storage.chat_configs.get_by_chat_id(msg.chat_id)
     
@@ -82,7 +87,9 @@ async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         return
     
     if chat_config.whitelist and msg.from_user.username:
-        if msg.from_user.username in chat_config.whitelist:
+        # frozenset из TTL-кэша координатора: O(1) membership вместо
+        # линейного скана списка на каждое сообщение
+        if msg.from_user.username in _coordinator.get_whitelist(msg.chat_id):
             LOGGER.debug(f"User @{msg.from_user.username} in whitelist, skipping")
             return
     
@@ -8,13 +8,26 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
+from core.coordinator import get_coordinator
 from storage import get_storage
+from storage.postgres import Storage
 from storage.interfaces import ModerationActionInput
 from utils.logger import get_logger
 
 LOGGER = get_logger(__name__)
 
 
+_STORAGE: Storage | None = None
+
+
+def _storage() -> Storage:
+    """Возвращает закэшированный handle на Storage (один lookup на модуль)."""
+    global _STORAGE
+    if _STORAGE is None:
+        _STORAGE = get_storage()
+    return _STORAGE
+
+
 async def on_ban_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Callback: ban:<chat_id>:<message_id>:<user_id>
@@ -39,7 +52,7 @@ async def on_ban_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text("❌ Ошибка парсинга данных")
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     if not chat_config or chat_config.owner_id != query.from_user.id:
         await query.answer("❌ У тебя нет прав на это действие", show_alert=True)
@@ -100,7 +113,7 @@ async def on_ham_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text("❌ Ошибка парсинга данных")
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     if not chat_config or chat_config.owner_id != query.from_user.id:
         await query.answer("❌ У тебя нет прав на это действие", show_alert=True)
@@ -142,7 +155,7 @@ async def on_whitelist_menu_callback(update: Update, context: ContextTypes.DEFAU
         await query.edit_message_text("❌ Неверный ID чата")
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     
     if not chat_config or chat_config.owner_id != query.from_user.id:
@@ -199,7 +212,7 @@ async def on_clear_whitelist_callback(update: Update, context: ContextTypes.DEFA
     await query.answer()
     
     chat_id = int(query.data.split(":")[1])
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     
     if not chat_config or chat_config.owner_id != query.from_user.id:
@@ -208,6 +221,7 @@ async def on_clear_whitelist_callback(update: Update, context: ContextTypes.DEFA
     
     try:
         storage.chat_configs.update(chat_id, whitelist=[])
+        get_coordinator().invalidate_whitelist(chat_id)
         await query.answer("✅ Whitelist очищен", show_alert=True)
         
         update.callback_query.data = f"whitelist_menu:{chat_id}"
@@ -242,7 +256,7 @@ async def on_whitelist_callback(update: Update, context: ContextTypes.DEFAULT_TY
         await query.edit_message_text("❌ Ошибка парсинга данных")
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     if not chat_config or chat_config.owner_id != query.from_user.id:
         await query.answer("❌ У тебя нет прав на это действие", show_alert=True)
@@ -264,6 +278,7 @@ async def on_whitelist_callback(update: Update, context: ContextTypes.DEFAULT_TY
         
         try:
             storage.chat_configs.update(chat_id, whitelist=current_whitelist)
+            get_coordinator().invalidate_whitelist(chat_id)
             result = f"⭐ @{username} добавлен в whitelist"
             await query.edit_message_text(
                 query.message.text_html + f"\n\n<i>{result}</i>",
@@ -290,7 +305,7 @@ async def on_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
     
     chat_id = int(query.data.split(":")[1])
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     if not chat_config or chat_config.owner_id != query.from_user.id:
         await query.answer("❌ У тебя нет прав на это действие", show_alert=True)
@@ -380,7 +395,7 @@ async def on_confirm_delete_callback(update: Update, context: ContextTypes.DEFAU
     await query.answer()
     
     chat_id = int(query.data.split(":")[1])
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     if not chat_config or chat_config.owner_id != query.from_user.id:
         await query.answer("❌ У тебя нет прав на это действие", show_alert=True)
@@ -416,7 +431,7 @@ async def on_setup_moderator_callback(update: Update, context: ContextTypes.DEFA
     chat_id = int(query.data.split(":")[1])
     owner_id = query.from_user.id
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     
     if not chat_config:
@@ -6,10 +6,58 @@ from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from storage import get_storage
+from storage.postgres import Storage
 from utils.logger import get_logger
 
 LOGGER = get_logger(__name__)
 
+# Статичные экраны собираются один раз на импорт модуля
+_MODE_SELECT_MESSAGE = (
+    "🔄 <b>Выбери режим защиты:</b>\n\n"
+    "<b>🗑️ Удаление спама</b> (рекомендуется)\n"
+    "Удаляет спам-сообщения, не банит пользователей\n\n"
+    "<b>⛔ Удаление + бан</b> (агрессивный)\n"
+    "Удаляет спам и банит при высокой уверенности\n\n"
+    "<b>🔍 Только уведомления</b> (тестовый)\n"
+    "Не удаляет, только отправляет уведомления"
+)
+
+_HELP_MESSAGE = (
+    "📖 <b>Справка по управлению</b>\n\n"
+    "<b>Легенда статусов:</b>\n"
+    "✅ - Защита активна\n"
+    "⚠️ - Защита приостановлена\n\n"
+    "<b>Режимы работы:</b>\n"
+    "🗑️ - Удаление спама (рекомендуется)\n"
+    "⛔ - Удаление + бан (агрессивный)\n"
+    "🔍 - Только уведомления (тестовый)\n\n"
+    "<b>Команды в группе:</b>\n"
+    "/status - Статус защиты\n"
+    "/pause - Приостановить\n"
+    "/resume - Возобновить\n"
+    "/test {текст} - Тестировать бота\n\n"
+    "<b>Управление:</b>\n"
+    "• Настройка порогов срабатывания\n"
+    "• Whitelist для доверенных пользователей\n"
+    "• Статистика за последние 7 дней\n"
+    "• Удаление чата из списка"
+)
+
+_HELP_KEYBOARD = InlineKeyboardMarkup([[
+    InlineKeyboardButton("◀️ Назад к списку", callback_data="back_to_mychats")
+]])
+
+
+_STORAGE: Storage | None = None
+
+
+def _storage() -> Storage:
+    """Возвращает закэшированный handle на Storage (один lookup на модуль)."""
+    global _STORAGE
+    if _STORAGE is None:
+        _STORAGE = get_storage()
+    return _STORAGE
+
 
 async def cmd_mychats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show list of owner's chats. Works only in private messages."""
@@ -24,7 +72,7 @@ async def cmd_mychats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
     
     owner_id = update.effective_user.id
-    storage = get_storage()
+    storage = _storage()
     chats = storage.chat_configs.get_by_owner_id(owner_id)
     
     if not chats:
@@ -80,8 +128,7 @@ async def on_chat_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
     Format: chat_menu:<chat_id>
     """
     query = update.callback_query
-    if not query:
-        return
+    assert query is not None  # handlers are registered on CallbackQueryHandler only
     
     await query.answer()
     
@@ -96,7 +143,7 @@ async def on_chat_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
         await query.edit_message_text("❌ Неверный ID чата")
         return
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     
     if not chat_config:
@@ -106,7 +153,13 @@ async def on_chat_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
     if chat_config.owner_id != query.from_user.id:
         await query.answer("❌ Ты не владелец этого чата", show_alert=True)
         return
-    
+
+    await _render_chat_settings(query, chat_config)
+
+
+async def _render_chat_settings(query, chat_config) -> None:
+    """Отрисовка экрана настроек чата (без повторного fetch/валидации)."""
+    chat_id = chat_config.chat_id
     status = "✅ Активен" if chat_config.is_active else "⚠️ Не активен"
     mode_name = {
         "delete_only": "🗑️ Удаление спама",
@@ -115,18 +168,26 @@ async def on_chat_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
     }.get(chat_config.policy_mode, "❓ Неизвестно")
     
     mod_channel = "✅ Настроен" if chat_config.moderator_channel_id else "❌ Не настроен"
-    
-    message = (
-        f"⚙️ <b>Настройки чата</b>\n"
-        f"<b>Название:</b> {chat_config.chat_title or 'Неизвестно'}\n"
-        f"<b>Статус:</b> {status}\n"
-        f"<b>Режим:</b> {mode_name}\n"
-        f"<b>Модераторский канал:</b> {mod_channel}\n\n"
-        f"<b>Пороги:</b>\n"
-        f" • Удаление: {chat_config.meta_delete:.0%}\n"
-        f" • Бан: {chat_config.meta_kick:.0%}\n\n"
-        f"<b>Whitelist:</b> {len(chat_config.whitelist) if chat_config.whitelist else 0} пользователей"
-    )
+
+    # Сборка через str.join вместо f-строки с ~10 интерполяциями —
+    # экран перерисовывается на каждое нажатие inline-кнопки.
+    message = "".join((
+        "⚙️ <b>Настройки чата</b>\n<b>Название:</b> ",
+        chat_config.chat_title or "Неизвестно",
+        "\n<b>Статус:</b> ",
+        status,
+        "\n<b>Режим:</b> ",
+        mode_name,
+        "\n<b>Модераторский канал:</b> ",
+        mod_channel,
+        "\n\n<b>Пороги:</b>\n • Удаление: ",
+        format(chat_config.meta_delete, ".0%"),
+        "\n • Бан: ",
+        format(chat_config.meta_kick, ".0%"),
+        "\n\n<b>Whitelist:</b> ",
+        str(len(chat_config.whitelist) if chat_config.whitelist else 0),
+        " пользователей",
+    ))
     
     keyboard = []
     
@@ -175,19 +236,24 @@ async def on_chat_menu_callback(update: Update, context: ContextTypes.DEFAULT_TY
 async def on_activate_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Активация защиты для чата."""
     query = update.callback_query
-    if not query:
-        return
+    assert query is not None  # handlers are registered on CallbackQueryHandler only
     
     await query.answer()
     
     chat_id = int(query.data.split(":")[1])
-    storage = get_storage()
-    
+    storage = _storage()
+
+    chat_config = storage.chat_configs.get_by_chat_id(chat_id)
+    if not chat_config:
+        await query.edit_message_text("❌ Чат не найден")
+        return
+
     try:
         storage.chat_configs.update(chat_id, is_active=True)
+        chat_config.is_active = True
         await query.answer("✅ Защита активирована!", show_alert=True)
-        await on_chat_menu_callback(update, context)
-        
+        await _render_chat_settings(query, chat_config)
+
         LOGGER.info(f"Chat {chat_id} activated by user {query.from_user.id}")
     except Exception as e:
         LOGGER.error(f"Failed to activate chat {chat_id}: {e}")
@@ -197,19 +263,24 @@ async def on_activate_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 async def on_pause_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Приостановка защиты для чата."""
     query = update.callback_query
-    if not query:
-        return
+    assert query is not None  # handlers are registered on CallbackQueryHandler only
     
     await query.answer()
     
     chat_id = int(query.data.split(":")[1])
-    storage = get_storage()
-    
+    storage = _storage()
+
+    chat_config = storage.chat_configs.get_by_chat_id(chat_id)
+    if not chat_config:
+        await query.edit_message_text("❌ Чат не найден")
+        return
+
     try:
         storage.chat_configs.update(chat_id, is_active=False)
+        chat_config.is_active = False
         await query.answer("⏸️ Защита приостановлена", show_alert=True)
-        await on_chat_menu_callback(update, context)
-        
+        await _render_chat_settings(query, chat_config)
+
         LOGGER.info(f"Chat {chat_id} paused by user {query.from_user.id}")
     except Exception as e:
         LOGGER.error(f"Failed to pause chat {chat_id}: {e}")
@@ -219,14 +290,13 @@ async def on_pause_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def on_change_mode_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Меню выбора режима работы."""
     query = update.callback_query
-    if not query:
-        return
+    assert query is not None  # handlers are registered on CallbackQueryHandler only
     
     await query.answer()
     
     chat_id = int(query.data.split(":")[1])
     
-    storage = get_storage()
+    storage = _storage()
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     
     if not chat_config:
@@ -234,17 +304,8 @@ async def on_change_mode_callback(update: Update, context: ContextTypes.DEFAULT_
         return
     
     has_channel = chat_config.moderator_channel_id is not None
-    
-    message = (
-        "🔄 <b>Выбери режим защиты:</b>\n\n"
-        "<b>🗑️ Удаление спама</b> (рекомендуется)\n"
-        "Удаляет спам-сообщения, не банит пользователей\n\n"
-        "<b>⛔ Удаление + бан</b> (агрессивный)\n"
-        "Удаляет спам и банит при высокой уверенности\n\n"
-        "<b>🔍 Только уведомления</b> (тестовый)\n"
-        "Не удаляет, только отправляет уведомления"
-    )
-    
+
+    message = _MODE_SELECT_MESSAGE
     if not has_channel:
         message += "\n\n⚠️ <i>Режимы с баном и уведомлениями требуют настройки модераторского канала</i>"
     
@@ -271,14 +332,13 @@ async def on_change_mode_callback(update: Update, context: ContextTypes.DEFAULT_
 async def on_set_mode_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Установка режима работы."""
     query = update.callback_query
-    if not query:
-        return
+    assert query is not None  # handlers are registered on CallbackQueryHandler only
     
     parts = query.data.split(":")
     chat_id = int(parts[1])
     new_mode = parts[2]
     
-    storage = get_storage()
+    storage = _storage()
     
     chat_config = storage.chat_configs.get_by_chat_id(chat_id)
     if not chat_config:
@@ -295,17 +355,17 @@ async def on_set_mode_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     
     try:
         storage.chat_configs.update(chat_id, policy_mode=new_mode)
-        
+        chat_config.policy_mode = new_mode
+
         mode_names = {
             "delete_only": "🗑️ Удаление спама",
             "delete_and_ban": "⛔ Удаление + бан",
             "notify_only": "🔍 Только уведомления",
         }
-        
+
         await query.answer(f"✅ Режим изменён: {mode_names.get(new_mode)}", show_alert=True)
-        update.callback_query.data = f"chat_menu:{chat_id}"
-        await on_chat_menu_callback(update, context)
-        
+        await _render_chat_settings(query, chat_config)
+
         LOGGER.info(f"Chat {chat_id} mode changed to {new_mode} by user {query.from_user.id}")
     except Exception as e:
         LOGGER.error(f"Failed to set mode for chat {chat_id}: {e}")
@@ -315,8 +375,7 @@ async def on_set_mode_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 async def on_back_to_mychats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Возврат к списку чатов."""
     query = update.callback_query
-    if not query:
-        return
+    assert query is not None  # handlers are registered on CallbackQueryHandler only
     
     await query.answer()
     await cmd_mychats(update, context)
@@ -325,38 +384,12 @@ async def on_back_to_mychats_callback(update: Update, context: ContextTypes.DEFA
 async def on_help_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Показывает справку по управлению чатами."""
     query = update.callback_query
-    if not query:
-        return
+    assert query is not None  # handlers are registered on CallbackQueryHandler only
     
     await query.answer()
-    
-    message = (
-        "📖 <b>Справка по управлению</b>\n\n"
-        "<b>Легенда статусов:</b>\n"
-        "✅ - Защита активна\n"
-        "⚠️ - Защита приостановлена\n\n"
-        "<b>Режимы работы:</b>\n"
-        "🗑️ - Удаление спама (рекомендуется)\n"
-        "⛔ - Удаление + бан (агрессивный)\n"
-        "🔍 - Только уведомления (тестовый)\n\n"
-        "<b>Команды в группе:</b>\n"
-        "/status - Статус защиты\n"
-        "/pause - Приостановить\n"
-        "/resume - Возобновить\n"
-        "/test {текст} - Тестировать бота\n\n"
-        "<b>Управление:</b>\n"
-        "• Настройка порогов срабатывания\n"
-        "• Whitelist для доверенных пользователей\n"
-        "• Статистика за последние 7 дней\n"
-        "• Удаление чата из списка"
-    )
-    
-    keyboard = [[
-        InlineKeyboardButton("◀️ Назад к списку", callback_data="back_to_mychats")
-    ]]
-    
+
     await query.edit_message_text(
-        message,
+        _HELP_MESSAGE,
         parse_mode=ParseMode.HTML,
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=_HELP_KEYBOARD
     )
@@ -1,16 +1,92 @@
 """Automatic chat registration when bot is added."""
 from __future__ import annotations
 
+import asyncio
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ChatMemberStatus, ParseMode
 from telegram.ext import ContextTypes
 
 from storage import get_storage, ChatConfigInput
+from bot.services.member_cache import get_cached_chat_member
+from storage.postgres import Storage
 from utils.logger import get_logger
 
 LOGGER = get_logger(__name__)
 
 
+# Статичные тексты и клавиатуры собираются один раз при импорте,
+# а не на каждый апдейт
+_MODE_EMOJI = {"delete_only": "🗑️", "delete_and_ban": "⛔", "notify_only": "🔍"}
+
+_FIRST_ADD_MESSAGE = (
+    "👋 <b>Привет! Я DespamLy</b> — бот для защиты от спама.\n\n"
+    "Я автоматически обнаруживаю и удаляю спам с помощью ML-моделей.\n\n"
+    "Нажми кнопку ниже, чтобы включить защиту.\n"
+    "Для расширенных настроек используй команду /mychats в личных сообщениях со мной.\n\n"
+    "📖 Подробная инструкция: /primer"
+)
+
+_NEED_ADMIN_MESSAGE = (
+    "❌ <b>Недостаточно прав</b>\n\n"
+    "Чтобы удалять спам, мне нужны права администратора с разрешением:\n"
+    "• Удаление сообщений\n\n"
+    "Дай мне эти права и нажми кнопку ниже."
+)
+
+_NEED_DELETE_RIGHT_MESSAGE = (
+    "❌ <b>Недостаточно прав</b>\n\n"
+    "У меня есть права администратора, но нет права <b>удалять сообщения</b>.\n\n"
+    "Добавь это право в настройках администратора и нажми кнопку ниже."
+)
+
+
+def _activate_initial_keyboard(chat_id: int) -> InlineKeyboardMarkup:
+    """Клавиатура включения защиты (callback_data содержит chat_id)."""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ Включить защиту", callback_data=f"activate_initial:{chat_id}")]
+    ])
+
+
+def _retry_activation_keyboard(chat_id: int) -> InlineKeyboardMarkup:
+    """Клавиатура повторной попытки после выдачи прав."""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔄 Попробовать снова", callback_data=f"activate_initial:{chat_id}")]
+    ])
+
+
+_STORAGE: Storage | None = None
+
+
+def _storage() -> Storage:
+    """Возвращает закэшированный handle на Storage (один lookup на модуль)."""
+    global _STORAGE
+    if _STORAGE is None:
+        _STORAGE = get_storage()
+    return _STORAGE
+
+
+async def _run_db(fn, *args, **kwargs):
+    """Выполняет синхронный вызов storage в пуле потоков, не блокируя event loop."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+# Per-chat локи: два почти одновременных my_chat_member по одному чату
+# не должны наперегонки пройти read-then-upsert и продублировать
+# приветствие; разные чаты при этом друг друга не блокируют
+_chat_locks: dict[int, asyncio.Lock] = {}
+
+
+def _lock_for(chat_id: int) -> asyncio.Lock:
+    """Возвращает лок конкретного чата, создавая его при первом обращении."""
+    if len(_chat_locks) > 1024:
+        # Свободные локи можно безопасно выбросить: повторное создание дёшево
+        for cid in [cid for cid, lock in _chat_locks.items() if not lock.locked()]:
+            del _chat_locks[cid]
+    return _chat_locks.setdefault(chat_id, asyncio.Lock())
+
+
+
 async def on_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle bot being added to or removed from a chat."""
     if not update.my_chat_member:
@@ -24,7 +100,7 @@ async def on_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not chat or not chat_member.from_user:
         return
     
-    storage = get_storage()
+    storage = _storage()
     owner_id = chat_member.from_user.id
     
     # СЦЕНАРИЙ: Бот добавлен в чат
@@ -33,88 +109,79 @@ async def on_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
         
         LOGGER.info(f"Bot added to chat {chat.id} ({chat.title}) by user {owner_id}")
         
-        # Проверяем: есть ли уже конфигурация? (повторное добавление)
-        existing_config = storage.chat_configs.get_by_chat_id(chat.id)
+        # read-then-upsert под per-chat локом
+        async with _lock_for(chat.id):
+            # Проверяем: есть ли уже конфигурация? (повторное добавление)
+            existing_config = await _run_db(storage.chat_configs.get_by_chat_id, chat.id)
         
-        if existing_config:
-            # СЦЕНАРИЙ: Повторное добавление — восстанавливаем настройки
-            LOGGER.info(f"Bot re-added to chat {chat.id}, showing restore options")
+            if existing_config:
+                # СЦЕНАРИЙ: Повторное добавление — восстанавливаем настройки
+                LOGGER.info(f"Bot re-added to chat {chat.id}, showing restore options")
             
-            keyboard = InlineKeyboardMarkup([
-                [InlineKeyboardButton(
-                    "✅ Восстановить защиту",
-                    callback_data=f"restore_config:{chat.id}"
-                )],
-                [InlineKeyboardButton(
-                    "🔄 Начать заново",
-                    callback_data=f"reset_config:{chat.id}"
-                )]
-            ])
+                keyboard = InlineKeyboardMarkup([
+                    [InlineKeyboardButton(
+                        "✅ Восстановить защиту",
+                        callback_data=f"restore_config:{chat.id}"
+                    )],
+                    [InlineKeyboardButton(
+                        "🔄 Начать заново",
+                        callback_data=f"reset_config:{chat.id}"
+                    )]
+                ])
             
-            has_moderator = "✅" if existing_config.moderator_channel_id else "❌"
-            mode_emoji = {"delete_only": "🗑️", "delete_and_ban": "⛔", "notify_only": "🔍"}
-            mode_name = mode_emoji.get(existing_config.policy_mode, "❓")
+                has_moderator = "✅" if existing_config.moderator_channel_id else "❌"
+                mode_name = _MODE_EMOJI.get(existing_config.policy_mode, "❓")
             
-            await context.bot.send_message(
-                chat_id=chat.id,
-                text=(
-                    "👋 <b>С возвращением!</b>\n\n"
-                    f"Я помню этот чат. У тебя были настройки:\n\n"
-                    f"• Режим: {mode_name} {existing_config.policy_mode}\n"
-                    f"• Модераторская группа: {has_moderator}\n"
-                    f"• Whitelist: {len(existing_config.whitelist or [])} пользователей\n\n"
-                    f"Хочешь восстановить защиту или начать заново?"
-                ),
-                parse_mode=ParseMode.HTML,
-                reply_markup=keyboard
-            )
-            return
-        
-        # СЦЕНАРИЙ: Первое добавление — создаём конфигурацию
-        config = ChatConfigInput(
-            chat_id=chat.id,
-            chat_title=chat.title,
-            chat_type=chat.type,
-            owner_id=owner_id,
-            policy_mode="delete_only",
-            is_active=False
-        )
+                await context.bot.send_message(
+                    chat_id=chat.id,
+                    text=(
+                        "👋 <b>С возвращением!</b>\n\n"
+                        f"Я помню этот чат. У тебя были настройки:\n\n"
+                        f"• Режим: {mode_name} {existing_config.policy_mode}\n"
+                        f"• Модераторская группа: {has_moderator}\n"
+                        f"• Whitelist: {len(existing_config.whitelist or [])} пользователей\n\n"
+                        f"Хочешь восстановить защиту или начать заново?"
+                    ),
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=keyboard
+                )
+                return
         
-        try:
-            storage.chat_configs.upsert(config)
-            LOGGER.info(f"Chat config created for chat {chat.id}")
-            
-            keyboard = InlineKeyboardMarkup([
-                [InlineKeyboardButton("✅ Включить защиту", callback_data=f"activate_initial:{chat.id}")]
-            ])
-            
-            await context.bot.send_message(
+            # СЦЕНАРИЙ: Первое добавление — создаём конфигурацию
+            config = ChatConfigInput(
                 chat_id=chat.id,
-                text=(
-                    "👋 <b>Привет! Я DespamLy</b> — бот для защиты от спама.\n\n"
-                    "Я автоматически обнаруживаю и удаляю спам с помощью ML-моделей.\n\n"
-                    "Нажми кнопку ниже, чтобы включить защиту.\n"
-                    "Для расширенных настроек используй команду /mychats в личных сообщениях со мной.\n\n"
-                    "📖 Подробная инструкция: /primer"
-                ),
-                parse_mode=ParseMode.HTML,
-                reply_markup=keyboard
+                chat_title=chat.title,
+                chat_type=chat.type,
+                owner_id=owner_id,
+                policy_mode="delete_only",
+                is_active=False
             )
-            
+        
             try:
+                await _run_db(storage.chat_configs.upsert, config)
+                LOGGER.info(f"Chat config created for chat {chat.id}")
+            
                 await context.bot.send_message(
-                    chat_id=owner_id,
-                    text=(
-                        f"✅ Я добавлен в чат <b>{chat.title}</b>\n\n"
-                        f"Напиши мне /mychats чтобы настроить защиту от спама."
-                    ),
-                    parse_mode=ParseMode.HTML
+                    chat_id=chat.id,
+                    text=_FIRST_ADD_MESSAGE,
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=_activate_initial_keyboard(chat.id)
                 )
-            except Exception as e:
-                LOGGER.warning(f"Failed to send DM to owner {owner_id}: {e}")
+            
+                try:
+                    await context.bot.send_message(
+                        chat_id=owner_id,
+                        text=(
+                            f"✅ Я добавлен в чат <b>{chat.title}</b>\n\n"
+                            f"Напиши мне /mychats чтобы настроить защиту от спама."
+                        ),
+                        parse_mode=ParseMode.HTML
+                    )
+                except Exception as e:
+                    LOGGER.warning(f"Failed to send DM to owner {owner_id}: {e}")
                 
-        except Exception as e:
-            LOGGER.error(f"Failed to create chat config for {chat.id}: {e}")
+            except Exception as e:
+                LOGGER.error(f"Failed to create chat config for {chat.id}: {e}")
     
     # СЦЕНАРИЙ: Бот удалён из чата
     elif new_status in (ChatMemberStatus.LEFT, ChatMemberStatus.BANNED) and \
@@ -123,14 +190,14 @@ async def on_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
         LOGGER.info(f"Bot removed from chat {chat.id} ({chat.title})")
         
         # Проверяем: это основной чат или модераторская группа?
-        main_chat = storage.chat_configs.get_by_chat_id(chat.id)
+        main_chat = await _run_db(storage.chat_configs.get_by_chat_id, chat.id)
         
         if main_chat:
             # СЦЕНАРИЙ: Удалён из основного чата
             LOGGER.info(f"Bot removed from main chat {chat.id}")
             
             try:
-                storage.chat_configs.update(chat.id, is_active=False)
+                await _run_db(storage.chat_configs.update, chat.id, is_active=False)
                 LOGGER.info(f"Chat {chat.id} deactivated")
                 
                 # Уведомляем владельца
@@ -157,54 +224,51 @@ async def on_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return
         
         # СЦЕНАРИЙ: Может это модераторская группа?
-        affected_chats = storage.chat_configs.get_by_moderator_channel_id(chat.id)
+        affected_chats = await _run_db(storage.chat_configs.get_by_moderator_channel_id, chat.id)
         
         if affected_chats:
             LOGGER.info(f"Bot removed from moderator group {chat.id}, affecting {len(affected_chats)} chats")
-            
-            for affected_chat in affected_chats:
-                old_mode = affected_chat.policy_mode
-                
+
+            try:
+                # Сбрасываем модераторскую группу и режим одним UPDATE
+                # вместо N отдельных запросов
+                await _run_db(storage.chat_configs.bulk_reset_moderator, chat.id)
+            except Exception as e:
+                LOGGER.error(f"Failed to reset moderator group {chat.id}: {e}")
+                return
+
+            async def _notify_owner(affected_chat) -> None:
+                mode_changed = affected_chat.policy_mode != "delete_only"
+
+                message = (
+                    f"⚠️ <b>Модераторская группа отключена</b>\n\n"
+                    f"Я был удалён из модераторской группы для чата <b>{affected_chat.chat_title}</b>.\n\n"
+                    f"<b>Что изменилось:</b>\n"
+                )
+
+                if mode_changed:
+                    message += f"• Режим переключен на 'Удаление спама'\n"
+
+                message += (
+                    f"• Модераторская группа отключена\n"
+                    f"• Режимы с баном и уведомлениями недоступны\n\n"
+                    f"<b>Защита продолжает работать</b> в режиме удаления спама.\n\n"
+                    f"Чтобы настроить новую модераторскую группу:\n"
+                    f"/mychats → выбери чат → Настроить модераторскую группу"
+                )
+
                 try:
-                    # Сбрасываем модераторскую группу и режим
-                    storage.chat_configs.update(
-                        affected_chat.chat_id,
-                        moderator_channel_id=None,
-                        policy_mode="delete_only"
+                    await context.bot.send_message(
+                        chat_id=affected_chat.owner_id,
+                        text=message,
+                        parse_mode=ParseMode.HTML
                     )
-                    
-                    mode_changed = old_mode != "delete_only"
-                    
-                    # Уведомляем владельца
-                    try:
-                        message = (
-                            f"⚠️ <b>Модераторская группа отключена</b>\n\n"
-                            f"Я был удалён из модераторской группы для чата <b>{affected_chat.chat_title}</b>.\n\n"
-                            f"<b>Что изменилось:</b>\n"
-                        )
-                        
-                        if mode_changed:
-                            message += f"• Режим переключен на 'Удаление спама'\n"
-                        
-                        message += (
-                            f"• Модераторская группа отключена\n"
-                            f"• Режимы с баном и уведомлениями недоступны\n\n"
-                            f"<b>Защита продолжает работать</b> в режиме удаления спама.\n\n"
-                            f"Чтобы настроить новую модераторскую группу:\n"
-                            f"/mychats → выбери чат → Настроить модераторскую группу"
-                        )
-                        
-                        await context.bot.send_message(
-                            chat_id=affected_chat.owner_id,
-                            text=message,
-                            parse_mode=ParseMode.HTML
-                        )
-                        LOGGER.info(f"Notified owner {affected_chat.owner_id} about moderator group removal")
-                    except Exception as e:
-                        LOGGER.error(f"Failed to notify owner {affected_chat.owner_id}: {e}")
-                        
+                    LOGGER.info(f"Notified owner {affected_chat.owner_id} about moderator group removal")
                 except Exception as e:
-                    LOGGER.error(f"Failed to reset moderator group for chat {affected_chat.chat_id}: {e}")
+                    LOGGER.error(f"Failed to notify owner {affected_chat.owner_id}: {e}")
+
+            # Отправки конкурентно: K·RTT → max(RTT)
+            await asyncio.gather(*(_notify_owner(a) for a in affected_chats))
 
 
 async def on_activate_initial_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -218,11 +282,12 @@ async def on_activate_initial_callback(update: Update, context: ContextTypes.DEF
     
     await query.answer()
     
-    chat_id = int(query.data.split(":")[1])
+    # chat_id уже распознан регуляркой из pattern при диспетчеризации
+    chat_id = int(context.matches[0].group(1))
     user_id = query.from_user.id
     
     try:
-        chat_member = await context.bot.get_chat_member(chat_id, user_id)
+        chat_member = await get_cached_chat_member(context.bot, chat_id, user_id)
         
         if chat_member.status not in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER):
             await query.answer(
@@ -234,29 +299,18 @@ async def on_activate_initial_callback(update: Update, context: ContextTypes.DEF
         bot_member = await context.bot.get_chat_member(chat_id, context.bot.id)
         
         if bot_member.status != ChatMemberStatus.ADMINISTRATOR:
-            keyboard = InlineKeyboardMarkup([
-                [InlineKeyboardButton("🔄 Попробовать снова", callback_data=f"activate_initial:{chat_id}")]
-            ])
             await query.edit_message_text(
-                "❌ <b>Недостаточно прав</b>\n\n"
-                "Чтобы удалять спам, мне нужны права администратора с разрешением:\n"
-                "• Удаление сообщений\n\n"
-                "Дай мне эти права и нажми кнопку ниже.",
+                _NEED_ADMIN_MESSAGE,
                 parse_mode=ParseMode.HTML,
-                reply_markup=keyboard
+                reply_markup=_retry_activation_keyboard(chat_id)
             )
             return
         
         if not bot_member.can_delete_messages:
-            keyboard = InlineKeyboardMarkup([
-                [InlineKeyboardButton("🔄 Попробовать снова", callback_data=f"activate_initial:{chat_id}")]
-            ])
             await query.edit_message_text(
-                "❌ <b>Недостаточно прав</b>\n\n"
-                "У меня есть права администратора, но нет права <b>удалять сообщения</b>.\n\n"
-                "Добавь это право в настройках администратора и нажми кнопку ниже.",
+                _NEED_DELETE_RIGHT_MESSAGE,
                 parse_mode=ParseMode.HTML,
-                reply_markup=keyboard
+                reply_markup=_retry_activation_keyboard(chat_id)
             )
             return
     
@@ -271,10 +325,10 @@ async def on_activate_initial_callback(update: Update, context: ContextTypes.DEF
         )
         return
     
-    storage = get_storage()
+    storage = _storage()
     
     try:
-        storage.chat_configs.update(chat_id, is_active=True)
+        await _run_db(storage.chat_configs.update, chat_id, is_active=True)
         
         await query.edit_message_text(
             "✅ <b>Защита включена!</b>\n\n"
@@ -308,12 +362,12 @@ async def on_restore_config_callback(update: Update, context: ContextTypes.DEFAU
     
     await query.answer()
     
-    chat_id = int(query.data.split(":")[1])
+    chat_id = int(context.matches[0].group(1))
     user_id = query.from_user.id
     
     # Проверка прав
     try:
-        chat_member = await context.bot.get_chat_member(chat_id, user_id)
+        chat_member = await get_cached_chat_member(context.bot, chat_id, user_id)
         if chat_member.status not in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER):
             await query.answer(
                 "❌ Только администраторы могут восстанавливать защиту",
@@ -325,11 +379,11 @@ async def on_restore_config_callback(update: Update, context: ContextTypes.DEFAU
         await query.answer("❌ Ошибка проверки прав", show_alert=True)
         return
     
-    storage = get_storage()
+    storage = _storage()
     
     try:
         # Просто активируем с прежними настройками
-        storage.chat_configs.update(chat_id, is_active=True)
+        await _run_db(storage.chat_configs.update, chat_id, is_active=True)
         
         await query.edit_message_text(
             "✅ <b>Защита восстановлена!</b>\n\n"
@@ -357,13 +411,13 @@ async def on_reset_config_callback(update: Update, context: ContextTypes.DEFAULT
     
     await query.answer()
     
-    chat_id = int(query.data.split(":")[1])
+    chat_id = int(context.matches[0].group(1))
     user_id = query.from_user.id
     chat = update.effective_chat
     
     # Проверка прав
     try:
-        chat_member = await context.bot.get_chat_member(chat_id, user_id)
+        chat_member = await get_cached_chat_member(context.bot, chat_id, user_id)
         if chat_member.status not in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER):
             await query.answer(
                 "❌ Только администраторы могут сбрасывать настройки",
@@ -375,7 +429,7 @@ async def on_reset_config_callback(update: Update, context: ContextTypes.DEFAULT
         await query.answer("❌ Ошибка проверки прав", show_alert=True)
         return
     
-    storage = get_storage()
+    storage = _storage()
     
     try:
         # Создаём новую конфигурацию (сбрасываем старую)
@@ -388,18 +442,14 @@ async def on_reset_config_callback(update: Update, context: ContextTypes.DEFAULT
             is_active=False
         )
         
-        storage.chat_configs.upsert(config)
-        
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Включить защиту", callback_data=f"activate_initial:{chat_id}")]
-        ])
+        await _run_db(storage.chat_configs.upsert, config)
         
         await query.edit_message_text(
             "🔄 <b>Настройки сброшены</b>\n\n"
             "Начинаем с чистого листа.\n"
             "Нажми кнопку ниже, чтобы включить защиту.",
             parse_mode=ParseMode.HTML,
-            reply_markup=keyboard
+            reply_markup=_activate_initial_keyboard(chat_id)
         )
         
         LOGGER.info(f"Chat {chat_id} config reset by user {user_id}")
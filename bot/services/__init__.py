@@ -1,17 +1,21 @@
 """Bot services: rate limiting, notifications, etc."""
+from .member_cache import get_cached_chat_member
 from .rate_limiter import RateLimiter, get_rate_limiter
 from .notifications import (
     NotificationBuffer,
     get_notification_buffer,
     send_individual_notification,
     send_grouped_notification,
+    send_many,
 )
 
 __all__ = [
+    "get_cached_chat_member",
     "RateLimiter",
     "get_rate_limiter",
     "NotificationBuffer",
     "get_notification_buffer",
     "send_individual_notification",
     "send_grouped_notification",
+    "send_many",
 ]
@@ -0,0 +1,46 @@
+"""
+TTL-кэш результатов Bot.get_chat_member.
+
+Проверка прав администратора в callback-хэндлерах — полноценный Telegram
+RPC на каждое нажатие кнопки. Повторные клики одного и того же админа в
+пределах TTL обслуживаются из кэша без обращения к API.
+"""
+from __future__ import annotations
+
+import time
+from typing import Tuple
+
+from cachetools import TTLCache
+from telegram import Bot, ChatMember
+
+DEFAULT_TTL = 30.0
+
+# Key: (chat_id, user_id), Value: (monotonic-время записи, ChatMember).
+# TTLCache сам выбрасывает просроченные записи и ограничивает размер —
+# обычный dict рос бы с каждой новой парой (chat_id, user_id) бесконечно.
+# Timestamp в значении остаётся ради per-call ttl меньше DEFAULT_TTL.
+_member_cache: TTLCache[Tuple[int, int], Tuple[float, ChatMember]] = TTLCache(
+    maxsize=16384, ttl=DEFAULT_TTL
+)
+
+
+async def get_cached_chat_member(
+    bot: Bot,
+    chat_id: int,
+    user_id: int,
+    *,
+    ttl: float = DEFAULT_TTL,
+) -> ChatMember:
+    """
+    Возвращает ChatMember из кэша, если запись моложе ttl секунд,
+    иначе запрашивает через bot.get_chat_member и кэширует.
+    """
+    key = (chat_id, user_id)
+    now = time.monotonic()
+    cached = _member_cache.get(key)
+    if cached is not None and now - cached[0] < ttl:
+        return cached[1]
+
+    member = await bot.get_chat_member(chat_id, user_id)
+    _member_cache[key] = (now, member)
+    return member
@@ -4,10 +4,14 @@
 """
 from __future__ import annotations
 
+import asyncio
+import functools
+import logging
 import time
-from collections import defaultdict
-from dataclasses import dataclass
-from typing import Dict, List
+from array import array
+
+from cachetools import TTLCache
+from typing import Dict, List, Set
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
@@ -17,18 +21,93 @@ from utils.logger import get_logger
 
 LOGGER = get_logger(__name__)
 
+# Ограничитель параллельных отправок: держимся ниже глобального
+# лимита Telegram ~30 msg/s, не сериализуя при этом await'ы
+_SEND_SEMAPHORE = asyncio.Semaphore(25)
+
+
+async def _send_one(
+    context: ContextTypes.DEFAULT_TYPE,
+    owner_id: int,
+    text: str,
+    keyboard: InlineKeyboardMarkup | None = None,
+) -> None:
+    """Одна отправка под семафором; ошибка логируется и не роняет батч."""
+    async with _SEND_SEMAPHORE:
+        try:
+            await context.bot.send_message(
+                chat_id=owner_id,
+                text=text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=keyboard,
+            )
+        except Exception as e:
+            LOGGER.error("Failed to send notification to %d: %s", owner_id, e)
+
+
+async def send_many(
+    context: ContextTypes.DEFAULT_TYPE,
+    payloads: List[tuple[int, str, InlineKeyboardMarkup | None]],
+) -> None:
+    """
+    Отправляет пачку сообщений (owner_id, text, keyboard) конкурентно.
+
+    Вместо последовательных await'ов (K·RTT) все отправки уходят одним
+    asyncio.gather под семафором — латентность ~max(RTT).
+    """
+    if not payloads:
+        return
+    await asyncio.gather(
+        *(_send_one(context, owner_id, text, keyboard) for owner_id, text, keyboard in payloads),
+        return_exceptions=True,
+    )
 
-@dataclass(slots=True)
-class PendingNotification:
-    """Ожидающее уведомление о спаме."""
-    chat_id: int
-    message_id: int
-    user_id: int
-    username: str
-    text: str
-    meta_score: float
-    action: str
-    created_at: float
+
+class _OwnerBatch:
+    """
+    Ожидающие уведомления одного владельца в колоночном (SoA) виде.
+
+    Числовые колонки лежат в array.array — батчевая группировка в
+    send_grouped_notification идёт по непрерывной памяти, а не по
+    разбросанным dataclass-объектам.
+    """
+
+    __slots__ = (
+        "chat_ids", "message_ids", "user_ids",
+        "usernames", "texts", "meta_scores", "actions", "created_at",
+    )
+
+    def __init__(self) -> None:
+        self.chat_ids = array("q")
+        self.message_ids = array("q")
+        self.user_ids = array("q")
+        self.usernames: List[str] = []
+        self.texts: List[str] = []
+        self.meta_scores = array("d")
+        self.actions: List[str] = []
+        self.created_at = array("d")
+
+    def __len__(self) -> int:
+        return len(self.chat_ids)
+
+    def append(
+        self,
+        chat_id: int,
+        message_id: int,
+        user_id: int,
+        username: str,
+        text: str,
+        meta_score: float,
+        action: str,
+    ) -> None:
+        self.chat_ids.append(chat_id)
+        self.message_ids.append(message_id)
+        self.user_ids.append(user_id)
+        self.usernames.append(username)
+        self.texts.append(text)
+        self.meta_scores.append(meta_score)
+        self.actions.append(action)
+        self.created_at.append(time.time())
 
 
 class NotificationBuffer:
@@ -40,16 +119,68 @@ class NotificationBuffer:
     - Batch уведомление если накопилось >10 pending уведомлений
     """
     
+    __slots__ = (
+        "batch_threshold",
+        "window_seconds",
+        "_buffer",
+        "_last_sent",
+        "_wake",
+        "_dirty_owners",
+        "_flusher_task",
+    )
+
     def __init__(self, batch_threshold: int = 10, window_seconds: int = 300):
         self.batch_threshold = batch_threshold
         self.window_seconds = window_seconds
         
-        # Key: owner_id, Value: список pending уведомлений
-        self._buffer: Dict[int, List[PendingNotification]] = defaultdict(list)
+        # Key: owner_id, Value: колоночный батч pending уведомлений
+        self._buffer: Dict[int, _OwnerBatch] = {}
         
-        # Key: owner_id, Value: timestamp последнего отправленного уведомления
-        self._last_sent: Dict[int, float] = {}
-    
+        # Key: owner_id, Value: timestamp последнего отправленного уведомления.
+        # TTLCache сам выбрасывает владельцев, давно не получавших
+        # уведомлений, — иначе dict растёт бесконечно. _buffer чистить не
+        # нужно: get_pending() удаляет батч при сбросе.
+        self._last_sent: TTLCache[int, float] = TTLCache(
+            maxsize=100_000, ttl=window_seconds * 4
+        )
+
+        # Event-driven flush: add() будит фоновую задачу вместо того,
+        # чтобы заставлять вызывающий код опрашивать should_send_* после
+        # каждого добавления. Таймаут гарантирует, что неполный батч
+        # не зависнет дольше window_seconds.
+        self._wake = asyncio.Event()
+        self._dirty_owners: Set[int] = set()
+        self._flusher_task: asyncio.Task | None = None
+
+    def start_flusher(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Запускает фоновую задачу сброса буфера (идемпотентно)."""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.get_running_loop().create_task(
+                self._flusher(context)
+            )
+
+    async def _flusher(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Сбрасывает накопленные уведомления по событию add() или таймауту."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.window_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            owners = self._dirty_owners
+            self._dirty_owners = set()
+            for owner_id in owners:
+                if not (self.should_send_batch(owner_id) or self.should_send_individual(owner_id)):
+                    # Рано — вернём владельца в очередь до следующего цикла
+                    self._dirty_owners.add(owner_id)
+                    continue
+                batch = self.get_pending(owner_id)
+                if not batch:
+                    continue
+                await send_grouped_notification(context, owner_id, batch)
+                self.mark_sent(owner_id)
+
     def add(
         self,
         owner_id: int,
@@ -60,34 +191,36 @@ class NotificationBuffer:
         text: str,
         meta_score: float,
         action: str,
-    ) -> None:
+    ) -> tuple[bool, int]:
         """
         Добавляет уведомление в буфер.
+
+        Returns:
+            (достигнут ли batch-порог, текущее число pending) — вызывающему
+            коду не нужен повторный lookup через should_send_batch.
         """
-        notification = PendingNotification(
-            chat_id=chat_id,
-            message_id=message_id,
-            user_id=user_id,
-            username=username,
-            text=text,
-            meta_score=meta_score,
-            action=action,
-            created_at=time.time(),
-        )
-        
-        self._buffer[owner_id].append(notification)
-        
-        LOGGER.debug(
-            f"Added notification to buffer for owner {owner_id}, "
-            f"total pending: {len(self._buffer[owner_id])}"
-        )
+        batch = self._buffer.get(owner_id)
+        if batch is None:
+            batch = self._buffer[owner_id] = _OwnerBatch()
+        batch.append(chat_id, message_id, user_id, username, text, meta_score, action)
+        self._dirty_owners.add(owner_id)
+        self._wake.set()
+
+        pending = len(batch)
+        # Ленивое %-форматирование: при LOG_LEVEL=INFO строка не собирается
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(
+                "Added notification to buffer for owner %d, total pending: %d",
+                owner_id, pending,
+            )
+        return pending >= self.batch_threshold, pending
     
     def should_send_batch(self, owner_id: int) -> bool:
         """
         Проверяет, нужно ли отправить batch уведомление.
         """
-        pending_count = len(self._buffer.get(owner_id, []))
-        return pending_count >= self.batch_threshold
+        batch = self._buffer.get(owner_id)
+        return batch is not None and len(batch) >= self.batch_threshold
     
     def should_send_individual(self, owner_id: int) -> bool:
         """
@@ -98,13 +231,11 @@ class NotificationBuffer:
         
         return time_passed >= self.window_seconds
     
-    def get_pending(self, owner_id: int) -> List[PendingNotification]:
+    def get_pending(self, owner_id: int) -> _OwnerBatch | None:
         """
-        Возвращает и очищает pending уведомления для владельца.
+        Возвращает и очищает pending батч для владельца.
         """
-        notifications = self._buffer.get(owner_id, [])
-        self._buffer[owner_id] = []
-        return notifications
+        return self._buffer.pop(owner_id, None)
     
     def mark_sent(self, owner_id: int) -> None:
         """
@@ -113,16 +244,47 @@ class NotificationBuffer:
         self._last_sent[owner_id] = time.time()
 
 
-# Глобальный буфер
-_notification_buffer: NotificationBuffer | None = None
+@functools.lru_cache(maxsize=1)
+def get_notification_buffer() -> NotificationBuffer:
+    """
+    Возвращает глобальный экземпляр NotificationBuffer.
 
+    lru_cache вместо global-guard: диспетчеризация кэша реализована на C,
+    а в тестах singleton сбрасывается через .cache_clear().
+    """
+    return NotificationBuffer()
 
-def get_notification_buffer() -> NotificationBuffer:
-    """Возвращает глобальный экземпляр NotificationBuffer."""
-    global _notification_buffer
-    if _notification_buffer is None:
-        _notification_buffer = NotificationBuffer()
-    return _notification_buffer
+
+_ACTION_EMOJI = {
+    "deleted": "🗑️",
+    "deleted_and_banned": "⛔",
+    "detected_only": "🔍",
+}
+
+
+@functools.lru_cache(maxsize=2048)
+def _render_individual(
+    chat_title: str,
+    username: str,
+    user_id: int,
+    meta_score: float,
+    action: str,
+    text_preview: str,
+) -> str:
+    """
+    Чистый рендер текста индивидуального уведомления.
+
+    Мемоизирован: при повторной отправке того же детекта (retry после
+    сетевой ошибки) готовая строка берётся из кэша вместо пересборки.
+    """
+    action_emoji = _ACTION_EMOJI.get(action, "❓")
+    return (
+        f"{action_emoji} <b>Спам в чате \"{chat_title}\"</b>\n\n"
+        f"👤 @{username} (ID: {user_id})\n"
+        f"📊 Уверенность: {meta_score*100:.1f}%\n"
+        f"✅ Действие: {action}\n\n"
+        f"<i>{text_preview}</i>"
+    )
 
 
 async def send_individual_notification(
@@ -140,20 +302,9 @@ async def send_individual_notification(
     """
     Отправляет индивидуальное уведомление с кнопками действий.
     """
-    action_emoji = {
-        "deleted": "🗑️",
-        "deleted_and_banned": "⛔",
-        "detected_only": "🔍",
-    }.get(action, "❓")
-    
     text_preview = text[:200] + ("..." if len(text) > 200 else "")
-    
-    message = (
-        f"{action_emoji} <b>Спам в чате \"{chat_title}\"</b>\n\n"
-        f"👤 @{username} (ID: {user_id})\n"
-        f"📊 Уверенность: {meta_score*100:.1f}%\n"
-        f"✅ Действие: {action}\n\n"
-        f"<i>{text_preview}</i>"
+    message = _render_individual(
+        chat_title, username, user_id, meta_score, action, text_preview
     )
     keyboard = InlineKeyboardMarkup([
         [
@@ -192,29 +343,29 @@ async def send_individual_notification(
 async def send_grouped_notification(
     context: ContextTypes.DEFAULT_TYPE,
     owner_id: int,
-    notifications: List[PendingNotification],
+    batch: _OwnerBatch,
 ) -> None:
     """
     Отправляет batch уведомление о нескольких детектах.
     """
-    if not notifications:
+    if not batch:
         return
-    by_chat: Dict[int, List[PendingNotification]] = defaultdict(list)
-    for notif in notifications:
-        by_chat[notif.chat_id].append(notif)
-    actions_count = defaultdict(int)
-    for notif in notifications:
-        actions_count[notif.action] += 1
-    message = (
-        f"🚨 <b>{len(notifications)} спам-сообщений</b> за последние 5 минут\n\n"
-    )
-    
-    for chat_id, chat_notifs in by_chat.items():
-        message += f"📂 Чат ID {chat_id}: {len(chat_notifs)} сообщений\n"
-    
-    message += "\n<b>Действия:</b>\n"
+    # Один слитый проход по обеим колонкам: каждый элемент батча
+    # трогается ровно один раз, вместо двух раздельных подсчётов
+    by_chat: Dict[int, int] = {}
+    actions_count: Dict[str, int] = {}
+    for cid, act in zip(batch.chat_ids, batch.actions):
+        by_chat[cid] = by_chat.get(cid, 0) + 1
+        actions_count[act] = actions_count.get(act, 0) + 1
+
+    # Сборка через список + join: без квадратичных += по str
+    parts = [f"🚨 <b>{len(batch)} спам-сообщений</b> за последние 5 минут\n"]
+    for chat_id, count in by_chat.items():
+        parts.append(f"📂 Чат ID {chat_id}: {count} сообщений")
+    parts.append("\n<b>Действия:</b>")
     for action, count in actions_count.items():
-        message += f" • {action}: {count}\n"
+        parts.append(f" • {action}: {count}")
+    message = "\n".join(parts) + "\n"
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("📊 Подробнее", callback_data="batch_details")]
     ])
@@ -227,6 +378,6 @@ async def send_grouped_notification(
             reply_markup=keyboard,
         )
         
-        LOGGER.info(f"Sent batch notification to owner {owner_id} ({len(notifications)} items)")
+        LOGGER.info("Sent batch notification to owner %d (%d items)", owner_id, len(batch))
     except Exception as e:
-        LOGGER.error(f"Failed to send batch notification to {owner_id}: {e}")
+        LOGGER.error("Failed to send batch notification to %d: %s", owner_id, e)
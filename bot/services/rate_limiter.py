@@ -4,8 +4,10 @@ In-memory rate limiter для защиты от флуда.
 """
 from __future__ import annotations
 
+import functools
+import heapq
 import time
-from collections import defaultdict
+from array import array
 from typing import Dict, List, Tuple
 
 from utils.logger import get_logger
@@ -16,94 +18,124 @@ LOGGER = get_logger(__name__)
 class RateLimiter:
     """
     In-memory rate limiter для детекта флуда.
-    
+
     Лимиты:
     - 3 сообщения в секунду
     - 10 сообщений в минуту
-    
+
     Key: (chat_id, user_id)
-    Value: список timestamp'ов
+    Value: array('I') секунд с момента старта (не длиннее минутного лимита)
+
+    Секундной точности флуд-детектору достаточно, поэтому timestamp'ы
+    хранятся как uint32 в array.array — 4 байта на запись вместо
+    24-байтового float-объекта. Очистка неактивных ключей ленивая, через
+    min-heap сроков истечения — без периодического скана всех ключей.
     """
-    
+
+    __slots__ = ("_windows", "_expiry_heap", "_started")
+
     def __init__(self):
-        self._windows: Dict[Tuple[int, int], List[float]] = defaultdict(list)
-        self._last_cleanup = time.time()
-    
-    def is_flood(self, chat_id: int, user_id: int) -> bool:
+        # Окно никогда не хранит больше минутного лимита (10 записей):
+        # при достижении лимита сообщение отклоняется без append
+        self._windows: Dict[Tuple[int, int], array] = {}
+        # (момент возможного истечения, key) — обрабатывается лениво в is_flood
+        self._expiry_heap: List[Tuple[int, Tuple[int, int]]] = []
+        # Точка отсчёта для компактных относительных секунд
+        self._started = time.monotonic()
+
+    def is_flood(self, chat_id: int, user_id: int, *, _now=time.monotonic) -> bool:
         """
         Проверяет, является ли текущее сообщение флудом.
-        
+
+        `_now` прибит default-аргументом: LOAD_FAST вместо LOAD_GLOBAL
+        на каждом вызове горячего пути.
+
         Returns:
             True если превышен лимит, False в противном случае
         """
-        now = time.time()
+        now = int(_now() - self._started)
         key = (chat_id, user_id)
-        if now - self._last_cleanup > 60:
-            self._cleanup_old_entries(now)
-            self._last_cleanup = now
-        timestamps = self._windows[key]
-        timestamps[:] = [ts for ts in timestamps if now - ts < 60]
-        recent_1s = sum(1 for ts in timestamps if now - ts < 1)
-        recent_1m = len(timestamps)
-        
+        self._expire_idle_keys(now)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = array("I")
+        stale = 0
+        for ts in window:
+            if now - ts >= 60:
+                stale += 1
+            else:
+                break
+        if stale:
+            del window[:stale]
+
+        # Один обратный проход: свежие timestamp'ы лежат в хвосте,
+        # выход по первому "старому" элементу
+        recent_1s = 0
+        for ts in reversed(window):
+            if now - ts < 1:
+                recent_1s += 1
+            else:
+                break
+
         if recent_1s >= 3:
             LOGGER.warning(
-                f"Rate limit exceeded (1s): chat_id={chat_id}, user_id={user_id}, "
-                f"count={recent_1s}"
+                "Rate limit exceeded (1s): chat_id=%d, user_id=%d, count=%d",
+                chat_id, user_id, recent_1s,
             )
             return True
-        
-        if recent_1m >= 10:
+
+        if len(window) >= 10:
             LOGGER.warning(
-                f"Rate limit exceeded (1m): chat_id={chat_id}, user_id={user_id}, "
-                f"count={recent_1m}"
+                "Rate limit exceeded (1m): chat_id=%d, user_id=%d, count=%d",
+                chat_id, user_id, len(window),
             )
             return True
-        timestamps.append(now)
-        
+        if not window:
+            heapq.heappush(self._expiry_heap, (now + 60, key))
+        window.append(now)
+
         return False
-    
-    def _cleanup_old_entries(self, now: float) -> None:
+
+    def _expire_idle_keys(self, now: float) -> None:
         """
-        Удаляет записи старше 1 минуты для экономии памяти.
+        Амортизированная очистка: снимает с кучи только реально истёкшие
+        ключи, активные перепланирует на момент истечения последнего
+        сообщения.
         """
-        keys_to_remove = []
-        
-        for key, timestamps in self._windows.items():
-            timestamps[:] = [ts for ts in timestamps if now - ts < 60]
-            if not timestamps:
-                keys_to_remove.append(key)
-        for key in keys_to_remove:
-            del self._windows[key]
-        
-        if keys_to_remove:
-            LOGGER.debug(f"Cleaned up {len(keys_to_remove)} inactive rate limit entries")
-    
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, key = heapq.heappop(self._expiry_heap)
+            window = self._windows.get(key)
+            if window is None:
+                continue
+            if not window or now - window[-1] >= 60:
+                del self._windows[key]
+                removed += 1
+            else:
+                heapq.heappush(self._expiry_heap, (window[-1] + 60, key))
+
+        if removed:
+            LOGGER.debug("Cleaned up %d inactive rate limit entries", removed)
+
     def get_stats(self) -> dict:
         """
         Возвращает статистику rate limiter'а.
         """
-        now = time.time()
+        now = int(time.monotonic() - self._started)
         active_users = sum(
-            1 for timestamps in self._windows.values()
-            if any(now - ts < 60 for ts in timestamps)
+            1 for window in self._windows.values()
+            if window and now - window[-1] < 60
         )
-        
+
         return {
             "total_keys": len(self._windows),
             "active_users_1m": active_users,
         }
 
 
-# Глобальный экземпляр
-_rate_limiter: RateLimiter | None = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_rate_limiter() -> RateLimiter:
     """
     Возвращает глобальный экземпляр RateLimiter (singleton).
     """
-    global _rate_limiter
-    if _rate_limiter is None:
-        _rate_limiter = RateLimiter()
-    return _rate_limiter
+    return RateLimiter()
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import functools
 import os
 from dataclasses import dataclass
 from pathlib import Path
@@ -9,10 +10,15 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
-load_dotenv(ROOT_DIR / ".env")
 
+# .env читается один раз на процесс; маркер в environ защищает от
+# повторного path-resolve/stat при реимпорте модуля
+if not os.environ.get("_DESPAMLY_ENV_LOADED"):
+    load_dotenv(ROOT_DIR / ".env")
+    os.environ["_DESPAMLY_ENV_LOADED"] = "1"
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class Settings:
     """Application settings loaded from environment variables."""
     
@@ -38,26 +44,38 @@ def _str_to_bool(raw: str | None, *, default: bool = False) -> bool:
     return raw.strip().lower() in {"1", "true", "yes", "on"}
 
 
-def _build_settings() -> Settings:
-    bot_token = os.environ.get("BOT_TOKEN")
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Строит Settings при первом обращении (один снимок environ на процесс)."""
+    # Один снимок environ: дальше читаем из обычного dict, а не из
+    # C-блока окружения на каждый get
+    env = dict(os.environ)
+    
+    bot_token = env.get("BOT_TOKEN")
     if not bot_token:
         raise RuntimeError("BOT_TOKEN is required in .env")
     
     return Settings(
         BOT_TOKEN=bot_token,
-        META_NOTIFY=float(os.environ.get("META_NOTIFY", "0.65")),
-        META_DELETE=float(os.environ.get("META_DELETE", "0.85")),
-        META_KICK=float(os.environ.get("META_KICK", "0.95")),
-        META_DOWNWEIGHT_ADMIN=float(os.environ.get("META_DOWNWEIGHT_ADMIN", "0.90")),
-        META_DOWNWEIGHT_REPLY_TO_STAFF=float(os.environ.get("META_DOWNWEIGHT_REPLY_TO_STAFF", "0.90")),
-        META_DOWNWEIGHT_WHITELIST=float(os.environ.get("META_DOWNWEIGHT_WHITELIST", "0.85")),
-        META_DOWNWEIGHT_BRAND=float(os.environ.get("META_DOWNWEIGHT_BRAND", "0.70")),
-        META_DOWNWEIGHT_ANNOUNCEMENT=float(os.environ.get("META_DOWNWEIGHT_ANNOUNCEMENT", "0.85")),
-        LOG_LEVEL=os.environ.get("LOG_LEVEL", "INFO").upper(),
-        DETAILED_DEBUG_INFO=_str_to_bool(os.environ.get("DETAILED_DEBUG_INFO"), default=False),
+        META_NOTIFY=float(env.get("META_NOTIFY", "0.65")),
+        META_DELETE=float(env.get("META_DELETE", "0.85")),
+        META_KICK=float(env.get("META_KICK", "0.95")),
+        META_DOWNWEIGHT_ADMIN=float(env.get("META_DOWNWEIGHT_ADMIN", "0.90")),
+        META_DOWNWEIGHT_REPLY_TO_STAFF=float(env.get("META_DOWNWEIGHT_REPLY_TO_STAFF", "0.90")),
+        META_DOWNWEIGHT_WHITELIST=float(env.get("META_DOWNWEIGHT_WHITELIST", "0.85")),
+        META_DOWNWEIGHT_BRAND=float(env.get("META_DOWNWEIGHT_BRAND", "0.70")),
+        META_DOWNWEIGHT_ANNOUNCEMENT=float(env.get("META_DOWNWEIGHT_ANNOUNCEMENT", "0.85")),
+        LOG_LEVEL=env.get("LOG_LEVEL", "INFO").upper(),
+        DETAILED_DEBUG_INFO=_str_to_bool(env.get("DETAILED_DEBUG_INFO"), default=False),
     )
 
 
-settings: Settings = _build_settings()
+def __getattr__(name: str):
+    # PEP 562: `from config.config import settings` работает по-прежнему,
+    # но объект строится лениво при первом обращении, а не при импорте
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-__all__ = ["settings", "Settings"]
+__all__ = ["settings", "Settings", "get_settings"]
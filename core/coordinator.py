@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from hashlib import blake2b
 from typing import Optional
 
+from cachetools import TTLCache
+
 from telegram import Message
 
 from core.types import AnalysisResult, MessageMetadata
 from filters.base import BaseFilter
+from storage.bootstrap import get_storage
 from filters.pattern import PatternClassifier
 from utils.logger import get_logger
 
@@ -38,6 +44,36 @@ class FilterCoordinator:
         self.keyword_filter = keyword_filter
         self.tfidf_filter = tfidf_filter
         self.pattern_filter = pattern_filter
+        # TTL-кэш whitelist'ов по chat_id: без похода в storage
+        # на каждое сообщение. Key: chat_id, Value: (monotonic, frozenset)
+        self._wl_cache: dict[int, tuple[float, frozenset]] = {}
+        self._wl_cache_ttl = 60.0
+        # Кэш результатов по хэшу текста: вирусный/форвардящийся спам
+        # не гоняет все три фильтра заново
+        self._result_cache: TTLCache = TTLCache(maxsize=8192, ttl=300)
+        # Однажды готовые фильтры не "разгружаются" — результат кэшируется
+        self._ready_cached = False
+    
+    def invalidate_whitelist(self, chat_id: int) -> None:
+        """Сбрасывает закэшированный whitelist чата (вызывать при обновлении конфига)."""
+        self._wl_cache.pop(chat_id, None)
+    
+    def get_whitelist(self, chat_id: int) -> frozenset:
+        """
+        Возвращает whitelist чата как frozenset из TTL-кэша или storage.
+        
+        frozenset даёт O(1) membership-проверки вместо линейного скана
+        списка на каждое сообщение.
+        """
+        now = time.monotonic()
+        hit = self._wl_cache.get(chat_id)
+        if hit is not None and now - hit[0] < self._wl_cache_ttl:
+            return hit[1]
+        
+        chat_config = get_storage().chat_configs.get_by_chat_id(chat_id)
+        whitelist = frozenset(chat_config.whitelist) if chat_config and chat_config.whitelist else frozenset()
+        self._wl_cache[chat_id] = (now, whitelist)
+        return whitelist
     
     def _extract_metadata(self, message: Message) -> MessageMetadata:
         """
@@ -49,48 +85,36 @@ class FilterCoordinator:
         Returns:
             MessageMetadata с контекстными флагами
         """
-        metadata = MessageMetadata(
-            message_id=message.message_id,
-            user_id=message.from_user.id if message.from_user else 0,
-            user_name=message.from_user.full_name if message.from_user else "Unknown",
-            chat_id=message.chat_id,
-            timestamp=message.date.timestamp() if message.date else 0.0,
-        )
+        whitelist = self.get_whitelist(message.chat_id)
+        
         is_reply = message.reply_to_message is not None
         reply_to_user_id = None
         reply_to_staff = False
-        
-        from storage.bootstrap import get_storage
-        storage = get_storage()
-        chat_config = storage.chat_configs.get_by_chat_id(message.chat_id)
-        whitelist = chat_config.whitelist if chat_config and chat_config.whitelist else []
-        
         if is_reply and message.reply_to_message.from_user:
             reply_to_user_id = message.reply_to_message.from_user.id
             reply_to_staff = reply_to_user_id in whitelist
         
-        is_forwarded = message.forward_origin is not None
-        
         author_is_admin = False
         if message.from_user:
             author_is_admin = message.from_user.id in whitelist
         
-        is_channel_announcement = (
-            message.sender_chat is not None and 
-            message.sender_chat.type == "channel"
-        )
-        from dataclasses import replace
-        metadata = replace(
-            metadata,
+        # Один вызов конструктора вместо MessageMetadata + dataclasses.replace
+        return MessageMetadata(
+            message_id=message.message_id,
+            user_id=message.from_user.id if message.from_user else 0,
+            user_name=message.from_user.full_name if message.from_user else "Unknown",
+            chat_id=message.chat_id,
+            timestamp=message.date.timestamp() if message.date else 0.0,
             is_reply=is_reply,
             reply_to_user_id=reply_to_user_id,
             reply_to_staff=reply_to_staff,
-            is_forwarded=is_forwarded,
+            is_forwarded=message.forward_origin is not None,
             author_is_admin=author_is_admin,
-            is_channel_announcement=is_channel_announcement
+            is_channel_announcement=(
+                message.sender_chat is not None and
+                message.sender_chat.type == "channel"
+            ),
         )
-        
-        return metadata
     
     async def analyze(
         self,
@@ -121,10 +145,23 @@ class FilterCoordinator:
                 f"is_forwarded={metadata.is_forwarded}, "
                 f"author_is_admin={metadata.author_is_admin}"
             )
-        keyword_result = await self.keyword_filter.analyze(text)
-        LOGGER.debug(f"Keyword: {keyword_result.score:.3f}")
         
-        tfidf_result = await self.tfidf_filter.analyze(text)
+        # Совсем короткие тексты дешевле пересчитать, огромные — не копим
+        cache_key = None
+        if 10 <= len(text) <= 2048:
+            cache_key = blake2b(text.encode("utf-8"), digest_size=8).digest()
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                LOGGER.debug("Analysis cache hit")
+                return cached.with_metadata(metadata)
+        
+        # Keyword и TF-IDF независимы — выполняются конкурентно;
+        # pattern ждёт их скоры и идёт следом
+        keyword_result, tfidf_result = await asyncio.gather(
+            self.keyword_filter.analyze(text),
+            self.tfidf_filter.analyze(text),
+        )
+        LOGGER.debug(f"Keyword: {keyword_result.score:.3f}")
         LOGGER.debug(f"TF-IDF: {tfidf_result.score:.3f}")
         pattern_result = await self.pattern_filter.analyze(
             text=text,
@@ -145,15 +182,44 @@ class FilterCoordinator:
             f"max={result.max_score:.3f}"
         )
         
+        if cache_key is not None:
+            self._result_cache[cache_key] = result
         return result
     
     def is_ready(self) -> bool:
-        """Проверка готовности всех фильтров"""
-        return (
+        """Проверка готовности всех фильтров (кэшируется после первого успеха)"""
+        if self._ready_cached:
+            return True
+        ready = (
             self.keyword_filter.is_ready() and
             self.tfidf_filter.is_ready() and
             self.pattern_filter.is_ready()
         )
+        self._ready_cached = ready
+        return ready
+    
+    def warm_up(self) -> None:
+        """
+        Прогревает модели фиктивным предсказанием.
+        
+        Первый transform/predict триггерит ленивые внутренние аллокации
+        sklearn/LightGBM — лучше заплатить это при старте, чем на первом
+        реальном сообщении.
+        """
+        import numpy as np
+        
+        started = time.monotonic()
+        try:
+            if self.tfidf_filter.is_ready():
+                self.tfidf_filter._predict_batch(["warmup"])
+            if self.pattern_filter.is_ready():
+                self.pattern_filter._predict_batch(
+                    [np.zeros(20, dtype=np.float32)]
+                )
+        except Exception as e:
+            LOGGER.warning(f"Model warm-up failed: {e}")
+        else:
+            LOGGER.debug(f"Models warmed up in {time.monotonic() - started:.3f}s")
 
 
 # Singleton instance
@@ -188,6 +254,7 @@ def get_coordinator() -> FilterCoordinator:
         )
         
         if _coordinator_instance.is_ready():
+            _coordinator_instance.warm_up()
             LOGGER.info("✅ FilterCoordinator готов к работе")
         else:
             LOGGER.warning("⚠️ FilterCoordinator не полностью готов (некоторые модели не загружены)")
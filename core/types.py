@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 from typing import List
 
@@ -50,6 +50,20 @@ class AnalysisResult:
     metadata: MessageMetadata | None = None
     applied_downweights: List[str] = field(default_factory=list)  # Примененные множители
     
+    # Агрегаты считаются один раз в __post_init__: policy-код читает
+    # average_score и max_score по несколько раз на сообщение
+    _average_score: float = field(init=False, repr=False)
+    _max_score: float = field(init=False, repr=False)
+    _all_high: bool = field(init=False, repr=False)
+    
+    def __post_init__(self) -> None:
+        kw = self.keyword_result.score
+        tf = self.tfidf_result.score
+        pat = self.pattern_result.score
+        object.__setattr__(self, "_average_score", kw * 0.20 + tf * 0.40 + pat * 0.40)
+        object.__setattr__(self, "_max_score", max(kw, tf, pat))
+        object.__setattr__(self, "_all_high", kw >= 0.7 and tf >= 0.7 and pat >= 0.7)
+    
     @property
     def average_score(self) -> float:
         """
@@ -60,27 +74,18 @@ class AnalysisResult:
         - TF-IDF: 40% (статистика char-grams)
         - Pattern: 40% (20 признаков + LightGBM)
         """
-        return (
-            self.keyword_result.score * 0.20 +
-            self.tfidf_result.score * 0.40 +
-            self.pattern_result.score * 0.40
-        )
+        return self._average_score
     
     @property
     def max_score(self) -> float:
         """Максимальная оценка среди всех фильтров"""
-        return max(
-            self.keyword_result.score,
-            self.tfidf_result.score,
-            self.pattern_result.score
-        )
+        return self._max_score
     
     @property
     def all_high(self) -> bool:
         """Проверка что все фильтры дали высокую оценку (>= 0.7)"""
-        threshold = 0.7
-        return (
-            self.keyword_result.score >= threshold and
-            self.tfidf_result.score >= threshold and
-            self.pattern_result.score >= threshold
-        )
+        return self._all_high
+    
+    def with_metadata(self, metadata: MessageMetadata | None) -> "AnalysisResult":
+        """Клон результата с другими метаданными (для кэша по тексту)."""
+        return replace(self, metadata=metadata, applied_downweights=list(self.applied_downweights))
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, List, Optional, Sequence
+
+from utils.logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+
+class PredictBatcher:
+    """
+    Микро-батчер для ML-инференса.
+
+    Вызовы predict_proba по одному сообщению платят Python-диспетчеризацию
+    sklearn/LightGBM на каждый апдейт. Батчер собирает конкурентные запросы
+    в очередь и прогоняет их одним векторизованным predict: первый элемент
+    ждёт не дольше max_delay, остальные подхватываются без ожидания.
+
+    predict_fn получает список элементов и возвращает список результатов
+    той же длины; выполняется в пуле потоков, чтобы не блокировать event
+    loop (sklearn/LightGBM отпускают GIL в C-коде).
+    """
+
+    __slots__ = ("_predict_fn", "_max_batch", "_max_delay", "_queue", "_task")
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[Any]], Sequence[Any]],
+        *,
+        max_batch: int = 32,
+        max_delay: float = 0.002,
+    ):
+        self._predict_fn = predict_fn
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, item: Any) -> Any:
+        """Ставит элемент в очередь и ждёт результат своего батча."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_delay
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await asyncio.to_thread(self._predict_fn, items)
+            except Exception as e:
+                LOGGER.error(f"Batched prediction failed: {e}", exc_info=True)
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
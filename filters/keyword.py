@@ -82,6 +82,13 @@ class KeywordFilter(BaseFilter):
         self.patterns = [re.compile(p, re.IGNORECASE) for p in default_data["patterns"]]
     
     async def analyze(self, text: str) -> FilterResult:
+        return self.analyze_sync(text)
+
+    def analyze_sync(self, text: str) -> FilterResult:
+        """
+        Синхронный вариант analyze: фильтр — чистый CPU, офлайн-потребителям
+        (обучающие скрипты) корутина и event loop не нужны.
+        """
         text_lower = text.lower()
         matched_keywords = []
         matched_patterns = []
@@ -1,14 +1,29 @@
 from __future__ import annotations
 
+import functools
 import re
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+import lightgbm as lgb
 import numpy as np
 from joblib import load
 
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - необязательное ускорение
+    ahocorasick = None
+
+try:
+    # RE2: линейный по тексту DFA вместо backtracking-движка stdlib —
+    # альтернации с квантификаторами не деградируют на крафтовом спаме
+    import re2 as _re_engine
+except ImportError:  # pragma: no cover - необязательное ускорение
+    _re_engine = re
+
 from core.types import FilterResult
 from filters.base import BaseFilter
+from filters.batching import PredictBatcher
 from utils.logger import get_logger
 
 if TYPE_CHECKING:
@@ -39,22 +54,51 @@ class PatternClassifier(BaseFilter):
         root_dir = Path(__file__).resolve().parents[1]
         self.model_dir = Path(model_dir) if model_dir else root_dir / "models"
         
+        self.booster_path = self.model_dir / "pattern_lgbm.txt"
         self.lgbm_path = self.model_dir / "pattern_lgbm.pkl"
+        self.calibrator_lut_path = self.model_dir / "pattern_calibrator_lut.npy"
         self.calibrator_path = self.model_dir / "pattern_calibrator.pkl"
-        
+
         self.lgbm = None
         self.calibrator = None
+        self._booster = None
+        self._calibrator_lut = None
         self._load_models()
         
         # Regex patterns для извлечения признаков
         self._compile_patterns()
+
+        # Микро-батчинг инференса: конкурентные сообщения уходят в LightGBM
+        # одной матрицей вместо predict_proba по одному
+        self._batcher = PredictBatcher(self._predict_batch)
+
+        # Текстовые признаки зависят только от текста: повторы и форварды
+        # одного и того же спама не гоняют 11 regex'ов заново
+        self._extract_text_features = functools.lru_cache(maxsize=4096)(
+            self._extract_text_features_uncached
+        )
     
     def _load_models(self) -> None:
         """Загружает LightGBM и isotonic calibrator"""
         try:
-            if self.lgbm_path.exists() and self.calibrator_path.exists():
+            if self.booster_path.exists():
+                # Нативный формат: lgb.Booster парсит текстовую модель
+                # напрямую, без pickle и реконструкции sklearn-обёртки
+                self._booster = lgb.Booster(model_file=str(self.booster_path))
+            elif self.lgbm_path.exists():
+                # Старый pickle-артефакт: низкоуровневый Booster достаётся
+                # из обёртки, predict без sklearn-валидации на каждый батч
                 self.lgbm = load(self.lgbm_path)
+                self._booster = getattr(self.lgbm, "booster_", None)
+
+            if self.calibrator_lut_path.exists():
+                # Запечённая изотоника: калибровка — одно индексирование
+                # массива из 1025 точек вместо бинарного поиска
+                self._calibrator_lut = np.load(self.calibrator_lut_path)
+            elif self.calibrator_path.exists():
                 self.calibrator = load(self.calibrator_path)
+
+            if self.is_ready():
                 LOGGER.info(f"Loaded PatternClassifier from {self.model_dir}")
             else:
                 LOGGER.warning(
@@ -65,21 +109,26 @@ class PatternClassifier(BaseFilter):
             LOGGER.error(f"Failed to load models: {e}")
             self.lgbm = None
             self.calibrator = None
+            self._booster = None
+            self._calibrator_lut = None
     
     def _compile_patterns(self) -> None:
         """Компилирует regex паттерны для извлечения признаков"""
+        # Все паттерны — строчные литералы и матчатся по заранее
+        # приведённому к lower() тексту: без re.I движок не делает
+        # Unicode case-folding на каждый символ
         self.patterns = {
             'phone': re.compile(r'\+?\d[\d\s\-\(\)]{9,}'),
             'url': re.compile(r'https?://|bit\.ly|t\.me/|\.rf\.gd|\.xo\.je'),
             'email': re.compile(r'[\w\.-]+@[\w\.-]+\.\w+'),
             'money': re.compile(r'[\$₽€]\s*\d+|\d+\s*[\$₽€руб]|доллар|рубл'),
             'age': re.compile(r'(?:от|с|старше|возраст)\s*\d{2}[+\s]|18\+|21\+|2[01]\s*\+'),
-            'cta': re.compile(r'пиш[иу]|жми|переход|кликай|тык|регистр|получ[аи]|забир|напиши\s*[+«]', re.I),
-            'dm': re.compile(r'в\s+личк|в\s+лс|в\s+директ|в\s+дм|пиши\s+в', re.I),
-            'remote': re.compile(r'удалённ|удаленн|дистанцион|онлайн.{0,10}работ|из\s+дома|с\s+телефон', re.I),
-            'legal': re.compile(r'легальн|белая\s+ниша|официальн|документ', re.I),
-            'casino': re.compile(r'казино|казик|каз[иь]|слот|ставк|bet|выигр|занос|депозит|rtp', re.I),
-            'obfuscation': re.compile(r'[@#$%&*]+[а-яa-z]+|[а-я]{2,}[@#$%&*]+|з@р@б|дοхοд|зaрaб', re.I),
+            'cta': re.compile(r'пиш[иу]|жми|переход|кликай|тык|регистр|получ[аи]|забир|напиши\s*[+«]'),
+            'dm': re.compile(r'в\s+личк|в\s+лс|в\s+директ|в\s+дм|пиши\s+в'),
+            'remote': re.compile(r'удалённ|удаленн|дистанцион|онлайн.{0,10}работ|из\s+дома|с\s+телефон'),
+            'legal': re.compile(r'легальн|белая\s+ниша|официальн|документ'),
+            'casino': re.compile(r'казино|казик|каз[иь]|слот|ставк|bet|выигр|занос|депозит|rtp'),
+            'obfuscation': re.compile(r'[@#$%&*]+[а-яa-z]+|[а-я]{2,}[@#$%&*]+|з@р@б|дοхοд|зaрaб'),
         }
         
         # Whitelist keywords (легитимные слова)
@@ -92,7 +141,134 @@ class PatternClassifier(BaseFilter):
         self.brand_keywords = [
             'lifemart', 'ozon', 'wildberries', 'wb', 'яндекс', 'сбер'
         ]
+
+        # Объединённая регулярка с именованными группами: один линейный
+        # проход по тексту вместо 11 независимых сканов
+        self.combined = _re_engine.compile(
+            "|".join(f"(?P<{name}>{p.pattern})" for name, p in self.patterns.items())
+        )
+
+        # Aho-Corasick: оба списка ключевых слов ищутся одним проходом
+        # O(N + matches) вместо отдельного substring-скана на слово
+        if ahocorasick is not None:
+            self._kw_automaton = ahocorasick.Automaton()
+            for word in self.whitelist_keywords:
+                self._kw_automaton.add_word(word, ('wl', word))
+            for word in self.brand_keywords:
+                self._kw_automaton.add_word(word, ('br', word))
+            self._kw_automaton.make_automaton()
+        else:
+            self._kw_automaton = None
+
+        # Fallback без pyahocorasick: одна C-level альтернация на список
+        # вместо 17 Python-циклов с substring-проверкой
+        self._wl_re = re.compile("|".join(map(re.escape, self.whitelist_keywords)))
+        self._brand_re = re.compile("|".join(map(re.escape, self.brand_keywords)))
     
+    def _predict_batch(self, feature_rows: list[np.ndarray]) -> list[tuple[float, float]]:
+        """
+        Прогоняет батч векторов признаков через LightGBM и калибратор.
+
+        Returns:
+            список пар (raw_proba, calibrated_proba)
+        """
+        if len(feature_rows) == 1:
+            # Частый случай при низком трафике: reshape-вью вместо
+            # копирования строки в новую матрицу
+            feats = feature_rows[0].reshape(1, -1)
+        else:
+            feats = np.stack(feature_rows)
+        if self._booster is not None:
+            # Booster.predict для binary сразу отдаёт P(spam) shape (n,)
+            raw = self._booster.predict(feats)
+        else:
+            raw = self.lgbm.predict_proba(feats)[:, 1]
+        if self._calibrator_lut is not None:
+            idx = np.clip((raw * 1024.0).astype(np.int32), 0, 1024)
+            calibrated = self._calibrator_lut[idx]
+        else:
+            calibrated = np.asarray(self.calibrator.predict(raw), dtype=np.float64)
+            np.clip(calibrated, 0.0, 1.0, out=calibrated)
+        return list(zip(raw.tolist(), calibrated.tolist()))
+
+    def _extract_text_features_uncached(self, text: str) -> np.ndarray:
+        """
+        Извлекает 14 признаков, зависящих только от текста
+        (12 паттернов + 2 счётчика ключевых слов).
+        
+        Returns:
+            numpy array shape (14,), read-only (используется как кэш-значение)
+        """
+        text_lower = text.lower()
+        
+        # Text patterns (12): один finditer по объединённой регулярке,
+        # lastgroup говорит, какая альтернатива сработала
+        counts: dict[str, int] = {}
+        for m in self.combined.finditer(text_lower):
+            g = m.lastgroup
+            counts[g] = counts.get(g, 0) + 1
+        
+        feat_has_phone = counts.get('phone', 0) > 0
+        feat_has_url = counts.get('url', 0) > 0
+        feat_has_email = counts.get('email', 0) > 0
+        
+        feat_has_money = counts.get('money', 0) > 0
+        feat_money_count = min(counts.get('money', 0), 5)  # cap at 5
+        
+        feat_has_age = counts.get('age', 0) > 0
+        feat_has_cta = counts.get('cta', 0) > 0
+        feat_has_dm = counts.get('dm', 0) > 0
+        feat_has_remote = counts.get('remote', 0) > 0
+        feat_has_legal = counts.get('legal', 0) > 0
+        feat_has_casino = counts.get('casino', 0) > 0
+        
+        # Obfuscation ratio
+        feat_obfuscation_ratio = min(
+            counts.get('obfuscation', 0) / max(len(text.split()), 1), 1.0
+        )
+        
+        # Whitelist hits (2)
+        if self._kw_automaton is not None:
+            # Каждое слово считается один раз (семантика substring-проверки),
+            # повторные вхождения отбрасываются через set
+            whitelist_hits = 0
+            brand_hits = 0
+            seen: set[str] = set()
+            for _, (kind, word) in self._kw_automaton.iter(text_lower):
+                if word in seen:
+                    continue
+                seen.add(word)
+                if kind == 'wl':
+                    whitelist_hits += 1
+                else:
+                    brand_hits += 1
+        else:
+            # Каждое слово один раз — как и у substring-семантики
+            whitelist_hits = len(set(self._wl_re.findall(text_lower)))
+            brand_hits = len(set(self._brand_re.findall(text_lower)))
+        feat_whitelist = min(whitelist_hits, 5)
+        feat_brand = min(brand_hits, 3)
+
+        # Прямое заполнение float32-буфера: без промежуточного списка
+        # Python-float'ов и без прохода np.array по нему
+        features = np.empty(14, dtype=np.float32)
+        features[0] = feat_has_phone
+        features[1] = feat_has_url
+        features[2] = feat_has_email
+        features[3] = feat_has_money
+        features[4] = feat_money_count
+        features[5] = feat_has_age
+        features[6] = feat_has_cta
+        features[7] = feat_has_dm
+        features[8] = feat_has_remote
+        features[9] = feat_has_legal
+        features[10] = feat_has_casino
+        features[11] = feat_obfuscation_ratio
+        features[12] = feat_whitelist
+        features[13] = feat_brand
+        features.setflags(write=False)
+        return features
+
     def _extract_features(
         self,
         text: str,
@@ -103,78 +279,30 @@ class PatternClassifier(BaseFilter):
         """
         Извлекает 20 признаков из текста и метаданных.
         
+        Текстовая часть берётся из LRU-кэша; scores и контекстные флаги
+        дописываются в свои слоты на каждый вызов.
+        
         Returns:
             numpy array shape (20,)
         """
-        text_lower = text.lower()
-        
-        # Scores from other filters (2)
-        feat_keyword = keyword_score
-        feat_tfidf = tfidf_score
+        text_features = self._extract_text_features(text)
         
+        features = np.empty(20, dtype=np.float32)
+        # Scores (2)
+        features[0] = keyword_score
+        features[1] = tfidf_score
         # Text patterns (12)
-        feat_has_phone = bool(self.patterns['phone'].search(text))
-        feat_has_url = bool(self.patterns['url'].search(text))
-        feat_has_email = bool(self.patterns['email'].search(text))
-        
-        money_matches = self.patterns['money'].findall(text_lower)
-        feat_has_money = len(money_matches) > 0
-        feat_money_count = min(len(money_matches), 5)  # cap at 5
-        
-        feat_has_age = bool(self.patterns['age'].search(text))
-        feat_has_cta = bool(self.patterns['cta'].search(text))
-        feat_has_dm = bool(self.patterns['dm'].search(text))
-        feat_has_remote = bool(self.patterns['remote'].search(text))
-        feat_has_legal = bool(self.patterns['legal'].search(text))
-        feat_has_casino = bool(self.patterns['casino'].search(text))
-        
-        # Obfuscation ratio
-        obf_matches = len(self.patterns['obfuscation'].findall(text))
-        feat_obfuscation_ratio = min(obf_matches / max(len(text.split()), 1), 1.0)
-        
+        features[2:14] = text_features[:12]
         # Context flags (4)
         if metadata:
-            feat_reply_to_staff = metadata.reply_to_staff
-            feat_is_forwarded = metadata.is_forwarded
-            feat_author_is_admin = metadata.author_is_admin
-            feat_is_channel = metadata.is_channel_announcement
+            features[14] = metadata.reply_to_staff
+            features[15] = metadata.is_forwarded
+            features[16] = metadata.author_is_admin
+            features[17] = metadata.is_channel_announcement
         else:
-            feat_reply_to_staff = False
-            feat_is_forwarded = False
-            feat_author_is_admin = False
-            feat_is_channel = False
-        
-        # Whitelist hits (2)
-        whitelist_hits = sum(1 for kw in self.whitelist_keywords if kw in text_lower)
-        brand_hits = sum(1 for kw in self.brand_keywords if kw in text_lower)
-        feat_whitelist = min(whitelist_hits, 5)
-        feat_brand = min(brand_hits, 3)
-        features = np.array([
-            # Scores (2)
-            feat_keyword,
-            feat_tfidf,
-            # Text patterns (12)
-            float(feat_has_phone),
-            float(feat_has_url),
-            float(feat_has_email),
-            float(feat_has_money),
-            float(feat_money_count),
-            float(feat_has_age),
-            float(feat_has_cta),
-            float(feat_has_dm),
-            float(feat_has_remote),
-            float(feat_has_legal),
-            float(feat_has_casino),
-            float(feat_obfuscation_ratio),
-            # Context flags (4)
-            float(feat_reply_to_staff),
-            float(feat_is_forwarded),
-            float(feat_author_is_admin),
-            float(feat_is_channel),
-            # Whitelist (2)
-            float(feat_whitelist),
-            float(feat_brand),
-        ], dtype=np.float32)
+            features[14:18] = 0.0
+        # Whitelist (2)
+        features[18:20] = text_features[12:]
         
         return features
     
@@ -197,7 +325,7 @@ class PatternClassifier(BaseFilter):
         Returns:
             FilterResult с calibrated вероятностью спама
         """
-        if not self.lgbm or not self.calibrator:
+        if not self.is_ready():
             LOGGER.warning("Models not loaded, returning neutral score")
             return FilterResult(
                 filter_name=self.name,
@@ -208,9 +336,7 @@ class PatternClassifier(BaseFilter):
         
         try:
             features = self._extract_features(text, metadata, keyword_score, tfidf_score)
-            raw_proba = self.lgbm.predict_proba([features])[0, 1]
-            calibrated_proba = float(self.calibrator.predict([raw_proba])[0])
-            calibrated_proba = np.clip(calibrated_proba, 0.0, 1.0)
+            raw_proba, calibrated_proba = await self._batcher.submit(features)
             
             return FilterResult(
                 filter_name=self.name,
@@ -232,4 +358,6 @@ class PatternClassifier(BaseFilter):
             )
     
     def is_ready(self) -> bool:
-        return self.lgbm is not None and self.calibrator is not None
+        has_model = self._booster is not None or self.lgbm is not None
+        has_calibrator = self._calibrator_lut is not None or self.calibrator is not None
+        return has_model and has_calibrator
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import csv
 from pathlib import Path
 
 import pandas as pd
@@ -11,6 +12,7 @@ from sklearn.pipeline import Pipeline
 
 from core.types import FilterResult
 from filters.base import BaseFilter
+from filters.batching import PredictBatcher
 from utils.logger import get_logger
 
 LOGGER = get_logger(__name__)
@@ -32,7 +34,14 @@ class TfidfFilter(BaseFilter):
         self.vectorizer: TfidfVectorizer | None = None
         self.classifier: CalibratedClassifierCV | None = None
         self._new_samples = 0
+        # (message, label) уже известных примеров; строится лениво
+        # при первом update_dataset
+        self._seen: set[tuple[str, int]] | None = None
         self._load_models()
+
+        # Микро-батчинг: vectorizer.transform и predict_proba сильно
+        # выигрывают от пачки текстов за один вызов
+        self._batcher = PredictBatcher(self._predict_batch)
     
     def _load_models(self) -> None:
         """Загружает vectorizer и classifier из отдельных файлов"""
@@ -58,6 +67,11 @@ class TfidfFilter(BaseFilter):
             "New architecture uses char-level n-grams (1-4) and calibrated LogisticRegression."
         )
     
+    def _predict_batch(self, texts: list[str]):
+        """Векторизует и классифицирует пачку текстов за один проход."""
+        features = self.vectorizer.transform(texts)
+        return self.classifier.predict_proba(features)
+
     async def analyze(self, text: str) -> FilterResult:
         if not self.vectorizer or not self.classifier:
             LOGGER.warning("Models not loaded, returning neutral score")
@@ -69,8 +83,7 @@ class TfidfFilter(BaseFilter):
             )
         
         try:
-            features = self.vectorizer.transform([text])
-            proba = self.classifier.predict_proba(features)[0]
+            proba = await self._batcher.submit(text)
             spam_proba = float(proba[1]) if len(proba) > 1 else 0.5
             prediction = int(spam_proba > 0.5)
             
@@ -104,14 +117,20 @@ class TfidfFilter(BaseFilter):
             return False
         
         try:
-            df = pd.read_csv(self.dataset_path)
-            duplicate_mask = (df["message"] == message) & (df["label"] == label)
-            if duplicate_mask.any():
+            if self._seen is None:
+                # Единственное полное чтение CSV — дальше дедупликация O(1)
+                df = pd.read_csv(self.dataset_path)
+                self._seen = set(zip(df["message"], df["label"]))
+            
+            key = (message, label)
+            if key in self._seen:
                 LOGGER.debug("Sample already exists in dataset")
                 return False
             
-            df.loc[len(df)] = [message, label]
-            df.to_csv(self.dataset_path, index=False)
+            # Append одной строки вместо полного parse + rewrite файла
+            with open(self.dataset_path, "a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow([message, label])
+            self._seen.add(key)
             LOGGER.info(f"Added new sample to dataset: {message[:50]}... | label={label}")
             
             self._new_samples += 1
@@ -6,52 +6,120 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
 
+import argparse
+import os
+
 import pandas as pd
 import numpy as np
-import asyncio
 import lightgbm as lgb
 from sklearn.isotonic import IsotonicRegression
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedShuffleSplit
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, classification_report
-from joblib import dump
+from sklearn.utils.class_weight import compute_sample_weight
+from joblib import Parallel, delayed
 
 from filters.keyword import KeywordFilter
 from filters.tfidf import TfidfFilter
 from filters.pattern import PatternClassifier
-from core.types import MessageMetadata
 
-async def extract_features(df, keyword_filter, tfidf_filter, pattern_clf):
+# Ниже этого размера выборки форк loky-процессов дороже самого цикла
+_PARALLEL_MIN_ROWS = 2000
+
+# Экземпляр на worker-процесс: классификатор не пикл-ится (скомпилированные
+# regex, автомат, lru_cache), каждый worker строит свой один раз
+_WORKER_CLF = None
+
+def _text_features_chunk(msgs_chunk):
+    global _WORKER_CLF
+    if _WORKER_CLF is None:
+        _WORKER_CLF = PatternClassifier()
+    return np.stack([_WORKER_CLF._extract_text_features(t) for t in msgs_chunk])
+
+def extract_features(df, keyword_filter, tfidf_filter, pattern_clf):
     print(f"\n🔍 Extracting features from {len(df)} messages...")
-    features_list = []
-    
-    for idx, row in df.iterrows():
-        text = row['message']
-        keyword_result = await keyword_filter.analyze(text)
-        tfidf_result = await tfidf_filter.analyze(text)
-        
-        metadata = MessageMetadata(
-            message_id=idx, user_id=0, user_name="Unknown",
-            chat_id=0, timestamp=0.0
+    msgs = df['message'].to_numpy()
+    n = len(msgs)
+
+    # TF-IDF одним вызовом по всему столбцу: одна CSR-матрица и один
+    # predict_proba вместо n одиночных transform'ов через event loop.
+    # Без обученных моделей — нейтральные 0.5, как деградирует analyze()
+    if tfidf_filter.is_ready():
+        tfidf_scores = tfidf_filter.classifier.predict_proba(
+            tfidf_filter.vectorizer.transform(msgs)
+        )[:, 1]
+    else:
+        tfidf_scores = np.full(n, 0.5, dtype=np.float32)
+
+    # Матрица признаков заполняется по колонкам; контекстные флаги (14:18)
+    # в обучающей выборке всегда нулевые — np.zeros их уже покрывает
+    X = np.zeros((n, 20), dtype=np.float32)
+    X[:, 0] = [keyword_filter.analyze_sync(text).score for text in msgs]
+    X[:, 1] = tfidf_scores
+
+    n_jobs = os.cpu_count() or 1
+    if n >= _PARALLEL_MIN_ROWS and n_jobs > 1:
+        # Regex/автомат — чистый CPU: раскладываем по процессам, блоки
+        # возвращаются матрицами и склеиваются одним vstack
+        blocks = Parallel(n_jobs=n_jobs, prefer='processes')(
+            delayed(_text_features_chunk)(chunk)
+            for chunk in np.array_split(msgs, n_jobs)
         )
-        
-        features = pattern_clf._extract_features(text, metadata, keyword_result.score, tfidf_result.score)
-        features_list.append(features)
-        
-        if (idx + 1) % 500 == 0:
-            print(f"   Processed {idx + 1}/{len(df)}...")
-    
-    return np.array(features_list)
+        text_features = np.vstack(blocks)
+        X[:, 2:14] = text_features[:, :12]
+        X[:, 18:20] = text_features[:, 12:]
+    else:
+        for i, text in enumerate(msgs):
+            text_features = pattern_clf._extract_text_features(text)
+            X[i, 2:14] = text_features[:12]
+            X[i, 18:20] = text_features[12:]
+
+            if (i + 1) % 500 == 0:
+                print(f"   Processed {i + 1}/{n}...")
+
+    return X
+
+def _lgbm_gpu_available():
+    """Пробное обучение на 1 итерацию: есть ли CUDA-сборка LightGBM."""
+    try:
+        lgb.train(
+            {"device": "cuda", "verbose": -1},
+            lgb.Dataset(np.zeros((4, 2)), label=np.array([0, 1, 0, 1])),
+            num_boost_round=1,
+        )
+        return True
+    except Exception:
+        return False
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Train Pattern Classifier (LightGBM)")
+    # CPU по умолчанию: на 20 признаках выигрыш GPU съедается трансфером
+    # данных, cuda имеет смысл только для HPO-свипов на больших выборках
+    parser.add_argument(
+        "--device", choices=["cpu", "cuda"], default="cpu",
+        help="Устройство для обучения LightGBM (default: cpu)",
+    )
+    return parser.parse_args()
 
 def main():
+    args = _parse_args()
     print("=" * 60)
     print("Pattern Classifier Training (LightGBM)")
     print("=" * 60)
+
+    device_params = {}
+    if args.device == "cuda":
+        if _lgbm_gpu_available():
+            # На CUDA max_depth игнорируется — глубину ограничивает num_leaves
+            device_params = {"device": "cuda", "max_bin": 63}
+            print("🖥️ Device: cuda")
+        else:
+            print("⚠️ CUDA LightGBM недоступен, обучение на CPU")
     
     data_path = PROJECT_ROOT / "data" / "messages.csv"
     output_dir = PROJECT_ROOT / "models"
     
     print(f"\n📂 Loading dataset...")
-    df = pd.read_csv(data_path)
+    df = pd.read_csv(data_path, usecols=['message', 'label'], dtype={'label': 'int8'})
     df = df.drop_duplicates(subset='message', keep='first')
     print(f"✅ Loaded {len(df)} unique samples")
     
@@ -67,28 +135,53 @@ def main():
     print("✅ Filters loaded")
     
     print("\n🔧 Extracting 20 features...")
-    X = asyncio.run(extract_features(df, keyword_filter, tfidf_filter, pattern_clf))
+    X = extract_features(df, keyword_filter, tfidf_filter, pattern_clf)
     y = df['label'].values
     print(f"✅ Features shape: {X.shape}")
     
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    # Индексный split вместо train_test_split: матрица режется напрямую,
+    # float32-строки не проходят через лишние промежуточные копии
+    sss = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+    train_idx, test_idx = next(sss.split(np.zeros(len(y)), y))
+    X_train, X_test = X[train_idx], X[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
     print(f"\n🔀 Train: {len(X_train)}, Test: {len(X_test)}")
     
     print("\n🌳 Training LightGBM...")
-    lgbm_clf = lgb.LGBMClassifier(
-        n_estimators=100, max_depth=5, learning_rate=0.1,
-        num_leaves=31, class_weight='balanced', random_state=42, verbose=-1
+    # lgb.train поверх заранее сконструированного Dataset: бины строятся
+    # один раз, free_raw_data=False позволяет переиспользовать dtrain между
+    # HPO-прогонами без повторного копирования матрицы sklearn-обёрткой
+    dtrain = lgb.Dataset(
+        X_train,
+        label=y_train,
+        weight=compute_sample_weight('balanced', y_train),
+        free_raw_data=False,
     )
-    lgbm_clf.fit(X_train, y_train)
+    dtrain.construct()
+    params = {
+        "objective": "binary",
+        "max_depth": 5,
+        "learning_rate": 0.1,
+        "num_leaves": 31,
+        "seed": 42,
+        "verbose": -1,
+        **device_params,
+    }
+    booster = lgb.train(params, dtrain, num_boost_round=100)
     print("✅ LightGBM trained")
-    
+
     print("📊 Calibrating...")
-    train_proba = lgbm_clf.predict_proba(X_train)[:, 1]
+    train_proba = booster.predict(X_train)
     calibrator = IsotonicRegression(out_of_bounds='clip')
     calibrator.fit(train_proba, y_train)
+
+    # Изотоника «запекается» в таблицу из 1025 точек: на инференсе
+    # калибровка — одно индексирование массива вместо бинарного поиска;
+    # точность 1/1024 заведомо ниже гранулярности порогов META_*
+    calibrator_lut = calibrator.predict(np.linspace(0.0, 1.0, 1025)).astype(np.float32)
     
     print("\n📈 Evaluating...")
-    test_proba_raw = lgbm_clf.predict_proba(X_test)[:, 1]
+    test_proba_raw = booster.predict(X_test)
     test_proba = calibrator.predict(test_proba_raw)
     y_pred = (test_proba > 0.5).astype(int)
     
@@ -113,13 +206,15 @@ def main():
                      'has_money', 'money_count', 'has_age', 'has_cta', 'has_dm', 'has_remote',
                      'has_legal', 'has_casino', 'obfuscation_ratio', 'reply_to_staff',
                      'is_forwarded', 'author_is_admin', 'is_channel', 'whitelist_hits', 'brand_hits']
-    importance = lgbm_clf.feature_importances_
+    importance = booster.feature_importance()
     for i, (name, imp) in enumerate(sorted(zip(feature_names, importance), key=lambda x: x[1], reverse=True)[:10], 1):
         print(f"   {i:2d}. {name:20s} {imp:8.1f}")
     
     print(f"\n💾 Saving models...")
-    dump(lgbm_clf, output_dir / "pattern_lgbm.pkl")
-    dump(calibrator, output_dir / "pattern_calibrator.pkl")
+    # Нативный формат LightGBM: без pickle-протокола и sklearn-обёртки,
+    # на старте инференса грузится через lgb.Booster(model_file=...)
+    booster.save_model(str(output_dir / "pattern_lgbm.txt"))
+    np.save(output_dir / "pattern_calibrator_lut.npy", calibrator_lut)
     print(f"✅ Saved to {output_dir}")
     print("\n🎉 Training complete!")
 
@@ -6,16 +6,37 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
 
+import argparse
+
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LogisticRegression
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.model_selection import train_test_split
+
+try:
+    # sklearn >= 1.6: cv='prefit' выпилен в пользу FrozenEstimator
+    from sklearn.frozen import FrozenEstimator
+except ImportError:
+    FrozenEstimator = None
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, classification_report
 from joblib import dump
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Train TF-IDF classifier")
+    # HashingVectorizer не строит словарь — на больших корпусах fit
+    # char-4-грамм заметно быстрее; ценой становится потеря vocabulary_
+    parser.add_argument(
+        "--hashing", action="store_true",
+        help="Использовать HashingVectorizer вместо словарного TF-IDF",
+    )
+    return parser.parse_args()
+
+
 def main():
+    args = _parse_args()
     print("=" * 60)
     print("TF-IDF Classifier Training")
     print("=" * 60)
@@ -28,7 +49,9 @@ def main():
     classifier_path = output_dir / "tfidf_classifier.pkl"
     
     print(f"\n📂 Loading dataset from {data_path}...")
-    df = pd.read_csv(data_path)
+    # Только нужные колонки и явный узкий dtype: без inference-сканов
+    # и лишней памяти на служебные столбцы
+    df = pd.read_csv(data_path, usecols=['message', 'label'], dtype={'label': 'int8'})
     print(f"✅ Loaded {len(df)} samples")
     print(f"   Spam: {df['label'].sum()} | Ham: {len(df) - df['label'].sum()}")
     
@@ -42,24 +65,55 @@ def main():
     print(f"\n🔀 Train: {len(X_train)}, Test: {len(X_test)}")
     
     print("\n🔤 Training TF-IDF Vectorizer (char-level, 1-4 grams)...")
-    vectorizer = TfidfVectorizer(
-        max_features=10000,
-        ngram_range=(1, 4),
-        analyzer='char_wb',
-        sublinear_tf=True,
-        min_df=2
-    )
-    
+    if args.hashing:
+        # Stateless-хэширование + IDF-взвешивание: Pipeline сохраняет тот же
+        # transform-интерфейс, что и TfidfVectorizer, рантайм не замечает подмены
+        vectorizer = Pipeline([
+            ("hash", HashingVectorizer(
+                ngram_range=(1, 4),
+                analyzer='char_wb',
+                n_features=2**18,
+                alternate_sign=False,
+                dtype=np.float32
+            )),
+            ("tfidf", TfidfTransformer(sublinear_tf=True)),
+        ])
+    else:
+        vectorizer = TfidfVectorizer(
+            max_features=10000,
+            ngram_range=(1, 4),
+            analyzer='char_wb',
+            sublinear_tf=True,
+            min_df=2,
+            # float32 вдвое сокращает байты, прокачиваемые через CSR-умножения
+            # liblinear при обучении и predict_proba в рантайме
+            dtype=np.float32
+        )
+
     X_train_vec = vectorizer.fit_transform(X_train)
     X_test_vec = vectorizer.transform(X_test)
-    print(f"✅ Vocabulary: {len(vectorizer.vocabulary_)} features")
+    assert X_train_vec.dtype == np.float32
+    if args.hashing:
+        print(f"✅ Hashing space: {X_train_vec.shape[1]} features")
+    else:
+        print(f"✅ Vocabulary: {len(vectorizer.vocabulary_)} features")
     
     print("\n🤖 Training LogisticRegression...")
-    base_clf = LogisticRegression(C=1.0, max_iter=1000, solver='liblinear', class_weight='balanced', random_state=42)
+    # saga вместо liblinear: на больших sparse char-ngram матрицах сходится
+    # заметно быстрее; tol=1e-3 — дальше точности калибровка не различает
+    base_clf = LogisticRegression(
+        C=1.0, max_iter=1000, solver='saga',
+        class_weight='balanced', tol=1e-3, random_state=42
+    )
     base_clf.fit(X_train_vec, y_train)
     
     print("📊 Calibrating...")
-    calibrated_clf = CalibratedClassifierCV(base_clf, method='isotonic', cv='prefit')
+    # Только изотоническая калибровка поверх уже обученного liblinear:
+    # ни prefit, ни FrozenEstimator не рефитят LR (cv=3 обучал бы его трижды)
+    if FrozenEstimator is not None:
+        calibrated_clf = CalibratedClassifierCV(FrozenEstimator(base_clf), method='isotonic')
+    else:
+        calibrated_clf = CalibratedClassifierCV(base_clf, method='isotonic', cv='prefit')
     calibrated_clf.fit(X_train_vec, y_train)
     
     print("\n📈 Evaluating...")
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Mapping, Protocol, Sequence
+from typing import Iterator, Mapping, Protocol, Sequence
 
 
 @dataclass(slots=True)
@@ -135,8 +135,14 @@ class ChatDailyStatsInput:
 class ModerationStore(Protocol):
     def record_event(self, data: ModerationEventInput) -> int: ...
 
+    def record_events_bulk(self, data: Sequence[ModerationEventInput]) -> list[int]: ...
+
+    def bulk_import_events(self, data: Sequence[ModerationEventInput]) -> list[int]: ...
+
     def fetch_recent(self, limit: int = 100) -> Sequence[ModerationEvent]: ...
 
+    def stream_recent(self, limit: int | None = None) -> Iterator[ModerationEvent]: ...
+
     def record_action(self, data: ModerationActionInput) -> int: ...
 
     def fetch_actions(self, event_id: int) -> Sequence[ModerationAction]: ...
@@ -180,6 +186,8 @@ class ChatConfigStore(Protocol):
     
     def was_moderator_channel(self, channel_id: int) -> bool: ...
 
+    def bulk_reset_moderator(self, channel_id: int) -> None: ...
+
     def upsert(self, config: ChatConfigInput) -> None: ...
 
     def update(self, chat_id: int, **updates) -> None: ...
@@ -199,5 +207,7 @@ class ChatStatsStore(Protocol):
         users_banned: int = 0,
     ) -> None: ...
 
+    def increment_many(self, rows: Sequence[ChatDailyStatsInput]) -> None: ...
+
     def get_stats(self, chat_id: int, days: int = 7) -> Sequence[ChatDailyStats]: ...
 
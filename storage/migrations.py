@@ -127,6 +127,23 @@ MIGRATIONS: tuple[tuple[int, str], ...] = (
         ALTER TABLE chat_configs ADD COLUMN moderator_channel_id BIGINT;
         """,
     ),
+    (
+        5,
+        """
+        -- Whitelist as JSONB: typecaster psycopg2 декодирует колонку на
+        -- стороне драйвера, Python получает готовый list без json.loads
+        ALTER TABLE chat_configs ALTER COLUMN whitelist TYPE JSONB USING whitelist::jsonb;
+        """,
+    ),
+    (
+        6,
+        """
+        -- Поиск по модераторскому каналу (was_moderator_channel,
+        -- get_by_moderator_channel_id, bulk_reset_moderator) — по индексу
+        CREATE INDEX IF NOT EXISTS idx_chat_configs_moderator_channel
+            ON chat_configs(moderator_channel_id);
+        """,
+    ),
 )
 
 __all__ = ["MIGRATIONS"]
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 import contextlib
-import json
-from dataclasses import asdict
+import io
+from collections import deque
+from dataclasses import asdict, replace
 from datetime import datetime, date
-from threading import RLock
-from typing import Any, Iterable, Mapping, Sequence
+from operator import attrgetter
+from threading import Event, Lock, Thread, local
+from typing import Any, Iterable, Iterator, Mapping, Sequence
 
+import orjson
 import psycopg2
 import psycopg2.extras
-from psycopg2.extensions import connection as Connection
+from cachetools import TTLCache
+from psycopg2.pool import ThreadedConnectionPool
 
 from .interfaces import (
     ChatConfig,
@@ -31,80 +35,246 @@ from .interfaces import (
 )
 
 
+# Горячие одиночные statements: PREPARE выполняет пул на каждом новом
+# соединении (см. bootstrap), репозитории зовут их через EXECUTE — парсинг
+# и планирование оплачиваются один раз на сессию, а не на запрос.
+# Прерванные соединения пересоздаются пулом и готовятся заново.
+PREPARED_STATEMENTS: dict[str, str] = {
+    "touch_user": (
+        "UPDATE users SET last_seen_at = CURRENT_TIMESTAMP WHERE telegram_id = $1"
+    ),
+    "fetch_user": (
+        "SELECT telegram_id, username, first_seen_at, last_seen_at, "
+        "is_whitelisted, is_banned FROM users WHERE telegram_id = $1"
+    ),
+    "get_chat_config": (
+        "SELECT chat_id, chat_title, chat_type, owner_id, policy_mode, "
+        "meta_delete, meta_kick, is_active, whitelist, moderator_channel_id, "
+        "created_at, updated_at FROM chat_configs WHERE chat_id = $1"
+    ),
+    "increment_chat_stats": (
+        "INSERT INTO chat_daily_stats("
+        "chat_id, date, messages_processed, spam_detected, "
+        "messages_deleted, users_banned) "
+        "VALUES ($1, $2, $3, $4, $5, $6) "
+        "ON CONFLICT(chat_id, date) DO UPDATE SET "
+        "messages_processed = chat_daily_stats.messages_processed + EXCLUDED.messages_processed, "
+        "spam_detected = chat_daily_stats.spam_detected + EXCLUDED.spam_detected, "
+        "messages_deleted = chat_daily_stats.messages_deleted + EXCLUDED.messages_deleted, "
+        "users_banned = chat_daily_stats.users_banned + EXCLUDED.users_banned"
+    ),
+}
+
+
+# Поля input-dataclass'ов в порядке bind-параметров соответствующего INSERT:
+# attrgetter собирает кортеж в C-цикле вместо россыпи LOAD_ATTR на вызов
+_EVENT_FIELDS = attrgetter(
+    "chat_id", "message_id", "user_id", "username", "text_hash", "text_length",
+    "action", "action_confidence", "filter_keyword_score", "filter_tfidf_score",
+    "filter_pattern_score", "meta_debug", "source",
+)
+_ACTION_FIELDS = attrgetter("event_id", "moderator_id", "decision", "reason", "took_ms")
+_SNAPSHOT_FIELDS = attrgetter(
+    "period_start", "period", "spam_detected", "manual_overrides",
+    "avg_spam_score", "embed_failures",
+)
+# Первые восемь полей upsert'а конфига; whitelist и moderator_channel_id
+# дописываются вручную (whitelist требует сериализации)
+_CONFIG_HEAD_FIELDS = attrgetter(
+    "chat_id", "chat_title", "chat_type", "owner_id", "policy_mode",
+    "meta_delete", "meta_kick", "is_active",
+)
+
+
+# Прикреплённое к потоку соединение открытой Storage.transaction():
+# _cursor() всех репозиториев видит его и не коммитит сам
+_TX = local()
+
+
 class Storage:
     """
     Entry point for interacting with PostgreSQL-backed repositories.
     Uses connection pool and thread-safe operations.
     """
 
-    def __init__(self, *, conn: Connection):
-        self._conn = conn
-        self._lock = RLock()
-        self.events: ModerationStore = _ModerationStore(conn, self._lock)
-        self.users: UserStore = _UserStore(conn, self._lock)
-        self.metrics: MetricsStore = _MetricsStore(conn, self._lock)
-        self.settings: SettingsStore = _SettingsStore(conn, self._lock)
-        self.chat_configs: ChatConfigStore = _ChatConfigStore(conn, self._lock)
-        self.chat_stats: ChatStatsStore = _ChatStatsStore(conn, self._lock)
-        self.logs = _LogStore(conn, self._lock)
+    def __init__(self, *, pool: ThreadedConnectionPool):
+        self._pool = pool
+        self.events: ModerationStore = _ModerationStore(pool)
+        self.users: UserStore = _UserStore(pool)
+        self.metrics: MetricsStore = _MetricsStore(pool)
+        self.settings: SettingsStore = _SettingsStore(pool)
+        self.chat_configs: ChatConfigStore = _ChatConfigStore(pool)
+        self.chat_stats: ChatStatsStore = _ChatStatsStore(pool)
+        self.logs = _LogStore(pool)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Группирует несколько вызовов репозиториев в одну транзакцию.
+
+        Внутри блока все операции текущего потока идут по одному
+        прикреплённому соединению и коммитятся единожды на выходе —
+        событие + действие + инкремент статистики стоят один WAL-flush
+        вместо трёх. Вложенные transaction() не поддерживаются.
+        """
+        if getattr(_TX, "conn", None) is not None:
+            raise RuntimeError("Storage.transaction() does not support nesting")
+
+        conn = self._pool.getconn()
+        _TX.conn = conn
+        try:
+            yield
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            _TX.conn = None
+            self._pool.putconn(conn)
 
     def close(self) -> None:
-        with self._lock:
-            self._conn.close()
+        # Сначала дослить буфер логов — пулу нужны живые соединения
+        self.logs.close()
+        self._pool.closeall()
 
 
 class _PostgresRepoBase:
-    def __init__(self, conn: Connection, lock: RLock):
-        self._conn = conn
-        self._lock = lock
+    def __init__(self, pool: ThreadedConnectionPool):
+        self._pool = pool
 
     @contextlib.contextmanager
-    def _cursor(self) -> Iterable[psycopg2.extras.RealDictCursor]:
-        with self._lock:
-            cur = self._conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    def _cursor(self, cursor_factory=psycopg2.extras.RealDictCursor) -> Iterable[psycopg2.extras.RealDictCursor]:
+        # Внутри Storage.transaction() — прикреплённое соединение потока,
+        # commit/rollback делает сама транзакция на выходе из блока
+        tx_conn = getattr(_TX, "conn", None)
+        if tx_conn is not None:
+            cur = tx_conn.cursor(cursor_factory=cursor_factory)
             try:
                 yield cur
-                self._conn.commit()
+            finally:
+                cur.close()
+            return
+
+        # Соединение берётся из пула на одну операцию: параллельные запросы
+        # идут по разным сокетам, блокировка больше не нужна
+        conn = self._pool.getconn()
+        try:
+            cur = conn.cursor(cursor_factory=cursor_factory)
+            try:
+                yield cur
+                conn.commit()
             except Exception:
-                self._conn.rollback()
+                conn.rollback()
                 raise
             finally:
                 cur.close()
+        finally:
+            self._pool.putconn(conn)
+
+    def _tuple_cursor(self):
+        # Для fetch-методов, строящих dataclass'ы: обычный курсор отдаёт
+        # кортежи в порядке SELECT — без RealDictRow на строку и без
+        # kwargs-диспетчеризации, строка распаковывается позиционно
+        return self._cursor(cursor_factory=None)
+
+    def _execute_values(self, cur, sql: str, rows, *, fetch: bool = False):
+        """
+        Общий путь всех bulk-запросов: один INSERT ... VALUES (...),(...)
+        на страницу; page_size=500 держит число bind-параметров ниже
+        протокольного лимита Postgres.
+        """
+        return psycopg2.extras.execute_values(
+            cur, sql, rows, page_size=500, fetch=fetch
+        )
 
 
 class _ModerationStore(_PostgresRepoBase, ModerationStore):
+    # Выше этого размера пачки COPY обгоняет даже многострочный INSERT
+    _COPY_THRESHOLD = 10000
+
     def record_event(self, data: ModerationEventInput) -> int:
-        with self._cursor() as cur:
-            cur.execute(
+        return self.record_events_bulk([data])[0]
+
+    def record_events_bulk(self, data: Sequence[ModerationEventInput]) -> list[int]:
+        """
+        Записывает пачку событий одним INSERT ... VALUES (...),(...).
+
+        Postgres парсит и планирует statement один раз на страницу вместо
+        round-trip'а на событие.
+        """
+        if not data:
+            return []
+        with self._tuple_cursor() as cur:
+            rows = self._execute_values(
+                cur,
                 """
                 INSERT INTO moderation_events (
                     chat_id, message_id, user_id, username, text_hash, text_length,
                     action, action_confidence, filter_keyword_score,
                     filter_tfidf_score, filter_pattern_score, meta_debug, source
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ) VALUES %s
                 RETURNING id
                 """,
-                (
-                    data.chat_id,
-                    data.message_id,
-                    data.user_id,
-                    data.username,
-                    data.text_hash,
-                    data.text_length,
-                    data.action,
-                    data.action_confidence,
-                    data.filter_keyword_score,
-                    data.filter_tfidf_score,
-                    data.filter_pattern_score,
-                    data.meta_debug,
-                    data.source,
-                ),
+                [_EVENT_FIELDS(d) for d in data],
+                fetch=True,
             )
-            result = cur.fetchone()
-            return int(result["id"])
+            return [int(row[0]) for row in rows]
+
+    def bulk_import_events(self, data: Sequence[ModerationEventInput]) -> list[int]:
+        """
+        Импорт/backfill событий: маленькие пачки идут через обычный
+        bulk-INSERT, большие — через COPY во временную таблицу с
+        последующим INSERT ... SELECT ... RETURNING id (сам COPY не умеет
+        RETURNING). COPY — самый дешёвый путь массовой загрузки в Postgres.
+        """
+        if len(data) <= self._COPY_THRESHOLD:
+            return self.record_events_bulk(data)
+
+        buf = io.StringIO()
+        for d in data:
+            buf.write("\t".join(_copy_field(v) for v in _EVENT_FIELDS(d)))
+            buf.write("\n")
+        buf.seek(0)
+
+        with self._tuple_cursor() as cur:
+            # Только импортируемые колонки, без id/created_at — дефолты
+            # назначит основная таблица при INSERT ... SELECT
+            cur.execute(
+                """
+                CREATE TEMP TABLE tmp_import_events (
+                    chat_id BIGINT, message_id BIGINT, user_id BIGINT,
+                    username TEXT, text_hash TEXT, text_length INTEGER,
+                    action TEXT, action_confidence REAL,
+                    filter_keyword_score REAL, filter_tfidf_score REAL,
+                    filter_pattern_score REAL, meta_debug TEXT, source TEXT
+                ) ON COMMIT DROP
+                """
+            )
+            cur.copy_expert(
+                "COPY tmp_import_events(chat_id, message_id, user_id, username, "
+                "text_hash, text_length, action, action_confidence, "
+                "filter_keyword_score, filter_tfidf_score, filter_pattern_score, "
+                "meta_debug, source) FROM STDIN",
+                buf,
+            )
+            cur.execute(
+                """
+                INSERT INTO moderation_events (
+                    chat_id, message_id, user_id, username, text_hash, text_length,
+                    action, action_confidence, filter_keyword_score,
+                    filter_tfidf_score, filter_pattern_score, meta_debug, source
+                )
+                SELECT chat_id, message_id, user_id, username, text_hash, text_length,
+                       action, action_confidence, filter_keyword_score,
+                       filter_tfidf_score, filter_pattern_score, meta_debug, source
+                FROM tmp_import_events
+                RETURNING id
+                """
+            )
+            return [int(row[0]) for row in cur.fetchall()]
 
     def fetch_recent(self, limit: int = 100) -> Sequence[ModerationEvent]:
-        with self._cursor() as cur:
+        with self._tuple_cursor() as cur:
             cur.execute(
                 """
                 SELECT
@@ -119,26 +289,49 @@ class _ModerationStore(_PostgresRepoBase, ModerationStore):
             )
             rows = cur.fetchall()
 
-        return [
-            ModerationEvent(
-                id=row["id"],
-                created_at=row["created_at"],
-                chat_id=row["chat_id"],
-                message_id=row["message_id"],
-                user_id=row["user_id"],
-                username=row["username"],
-                text_hash=row["text_hash"],
-                text_length=row["text_length"],
-                action=row["action"],
-                action_confidence=row["action_confidence"],
-                filter_keyword_score=row["filter_keyword_score"],
-                filter_tfidf_score=row["filter_tfidf_score"],
-                filter_pattern_score=row["filter_pattern_score"],
-                meta_debug=row["meta_debug"],
-                source=row["source"],
-            )
-            for row in rows
-        ]
+        # Порядок колонок SELECT совпадает с порядком полей dataclass;
+        # локальное имя конструктора убирает LOAD_GLOBAL на каждой строке
+        _ME = ModerationEvent
+        return [_ME(*row) for row in rows]
+
+    def stream_recent(self, limit: int | None = None) -> Iterator[ModerationEvent]:
+        """
+        Стримит события именованным server-side курсором (itersize=1000):
+        Postgres отдаёт строки порциями, в памяти живёт одна порция вместо
+        полного fetchall + списка dataclass'ов. Соединение возвращается в
+        пул только после исчерпания генератора (или его закрытия).
+        """
+        conn = self._pool.getconn()
+        try:
+            cur = conn.cursor(name="moderation_events_stream")
+            cur.itersize = 1000
+            try:
+                cur.execute(
+                    """
+                    SELECT
+                        id, created_at, chat_id, message_id, user_id, username, text_hash,
+                        text_length, action, action_confidence, filter_keyword_score,
+                        filter_tfidf_score, filter_pattern_score, meta_debug, source
+                    FROM moderation_events
+                    ORDER BY created_at DESC
+                    LIMIT %s
+                    """,
+                    (limit,),
+                )
+                for row in cur:
+                    yield ModerationEvent(*row)
+            except Exception:
+                # CLOSE именованного курсора в abort-транзакции сам падает —
+                # откат уничтожает portal без явного close
+                conn.rollback()
+                raise
+            else:
+                cur.close()
+                conn.commit()
+        finally:
+            # Брошенный генератор (GeneratorExit) доходит сюда с открытой
+            # транзакцией — putconn сам откатит её перед возвратом в пул
+            self._pool.putconn(conn)
 
     def record_action(self, data: ModerationActionInput) -> int:
         with self._cursor() as cur:
@@ -149,19 +342,13 @@ class _ModerationStore(_PostgresRepoBase, ModerationStore):
                 ) VALUES (%s, %s, %s, %s, %s)
                 RETURNING id
                 """,
-                (
-                    data.event_id,
-                    data.moderator_id,
-                    data.decision,
-                    data.reason,
-                    data.took_ms,
-                ),
+                _ACTION_FIELDS(data),
             )
             result = cur.fetchone()
             return int(result["id"])
 
     def fetch_actions(self, event_id: int) -> Sequence[ModerationAction]:
-        with self._cursor() as cur:
+        with self._tuple_cursor() as cur:
             cur.execute(
                 """
                 SELECT
@@ -174,18 +361,8 @@ class _ModerationStore(_PostgresRepoBase, ModerationStore):
             )
             rows = cur.fetchall()
 
-        return [
-            ModerationAction(
-                id=row["id"],
-                event_id=row["event_id"],
-                performed_at=row["performed_at"],
-                moderator_id=row["moderator_id"],
-                decision=row["decision"],
-                reason=row["reason"],
-                took_ms=row["took_ms"],
-            )
-            for row in rows
-        ]
+        _MA = ModerationAction
+        return [_MA(*row) for row in rows]
 
 
 class _UserStore(_PostgresRepoBase, UserStore):
@@ -198,65 +375,42 @@ class _UserStore(_PostgresRepoBase, UserStore):
         is_banned: bool | None = None,
     ) -> None:
         with self._cursor() as cur:
-            # Build dynamic SET clause
-            updates = ["username = EXCLUDED.username", "last_seen_at = CURRENT_TIMESTAMP"]
-            if is_whitelisted is not None:
-                updates.append(f"is_whitelisted = {is_whitelisted}")
-            if is_banned is not None:
-                updates.append(f"is_banned = {is_banned}")
-
-            set_clause = ", ".join(updates)
-
+            # Фиксированный текст запроса: COALESCE(NULL, старое значение)
+            # заменяет динамический SET — план кэшируется, интерполяции
+            # значений в SQL больше нет
             cur.execute(
-                f"""
+                """
                 INSERT INTO users(telegram_id, username, is_whitelisted, is_banned)
-                VALUES (%s, %s, %s, %s)
+                VALUES (%s, %s, COALESCE(%s, FALSE), COALESCE(%s, FALSE))
                 ON CONFLICT(telegram_id) DO UPDATE SET
-                    {set_clause}
+                    username = EXCLUDED.username,
+                    last_seen_at = CURRENT_TIMESTAMP,
+                    is_whitelisted = COALESCE(%s, users.is_whitelisted),
+                    is_banned = COALESCE(%s, users.is_banned)
                 """,
                 (
                     telegram_id,
                     username,
-                    is_whitelisted if is_whitelisted is not None else False,
-                    is_banned if is_banned is not None else False,
+                    is_whitelisted,
+                    is_banned,
+                    is_whitelisted,
+                    is_banned,
                 ),
             )
 
     def touch(self, telegram_id: int) -> None:
         with self._cursor() as cur:
-            cur.execute(
-                """
-                UPDATE users
-                SET last_seen_at = CURRENT_TIMESTAMP
-                WHERE telegram_id = %s
-                """,
-                (telegram_id,),
-            )
+            cur.execute("EXECUTE touch_user (%s)", (telegram_id,))
 
     def fetch(self, telegram_id: int) -> UserProfile | None:
-        with self._cursor() as cur:
-            cur.execute(
-                """
-                SELECT telegram_id, username, first_seen_at, last_seen_at,
-                       is_whitelisted, is_banned
-                FROM users
-                WHERE telegram_id = %s
-                """,
-                (telegram_id,),
-            )
+        with self._tuple_cursor() as cur:
+            cur.execute("EXECUTE fetch_user (%s)", (telegram_id,))
             row = cur.fetchone()
 
         if not row:
             return None
 
-        return UserProfile(
-            telegram_id=row["telegram_id"],
-            username=row["username"],
-            first_seen_at=row["first_seen_at"],
-            last_seen_at=row["last_seen_at"],
-            is_whitelisted=row["is_whitelisted"],
-            is_banned=row["is_banned"],
-        )
+        return UserProfile(*row)
 
 
 class _MetricsStore(_PostgresRepoBase, MetricsStore):
@@ -275,18 +429,11 @@ class _MetricsStore(_PostgresRepoBase, MetricsStore):
                     avg_spam_score = EXCLUDED.avg_spam_score,
                     embed_failures = EXCLUDED.embed_failures
                 """,
-                (
-                    snapshot.period_start,
-                    snapshot.period,
-                    snapshot.spam_detected,
-                    snapshot.manual_overrides,
-                    snapshot.avg_spam_score,
-                    snapshot.embed_failures,
-                ),
+                _SNAPSHOT_FIELDS(snapshot),
             )
 
     def fetch_recent(self, limit: int = 30) -> Sequence[MetricsSnapshot]:
-        with self._cursor() as cur:
+        with self._tuple_cursor() as cur:
             cur.execute(
                 """
                 SELECT period_start, period, spam_detected, manual_overrides,
@@ -299,17 +446,8 @@ class _MetricsStore(_PostgresRepoBase, MetricsStore):
             )
             rows = cur.fetchall()
 
-        return [
-            MetricsSnapshot(
-                period_start=row["period_start"],
-                period=row["period"],
-                spam_detected=row["spam_detected"],
-                manual_overrides=row["manual_overrides"],
-                avg_spam_score=row["avg_spam_score"],
-                embed_failures=row["embed_failures"],
-            )
-            for row in rows
-        ]
+        _MS = MetricsSnapshot
+        return [_MS(*row) for row in rows]
 
 
 class _SettingsStore(_PostgresRepoBase, SettingsStore):
@@ -340,41 +478,51 @@ class _SettingsStore(_PostgresRepoBase, SettingsStore):
             cur.execute("DELETE FROM settings WHERE key = %s", (key,))
 
 
+def _config_copy(config: ChatConfig) -> ChatConfig:
+    """
+    Копия конфига для выдачи из кэша. replace() копирует неглубоко, а
+    хэндлеры делают whitelist.append(...) до update() — список копируется
+    явно, чтобы неперсистентная правка не жила в кэше.
+    """
+    wl = config.whitelist
+    return replace(config, whitelist=list(wl) if wl is not None else None)
+
+
 class _ChatConfigStore(_PostgresRepoBase, ChatConfigStore):
+    # Порядок колонок SELECT совпадает с порядком полей dataclass; whitelist —
+    # JSONB, typecaster psycopg2 отдаёт его уже list'ом (или None), без
+    # json.loads на строку (см. register_default_jsonb в bootstrap)
+
+    def __init__(self, pool: ThreadedConnectionPool):
+        super().__init__(pool)
+        # Конфиг чата читается на каждое входящее сообщение, а меняется
+        # редко: TTL страхует от записей мимо этого процесса, пишущие
+        # методы инвалидируют свой ключ сразу
+        self._cache: TTLCache[int, ChatConfig] = TTLCache(maxsize=4096, ttl=60)
+        self._cache_lock = Lock()
+
     def get_by_chat_id(self, chat_id: int) -> ChatConfig | None:
-        with self._cursor() as cur:
-            cur.execute(
-                """
-                SELECT chat_id, chat_title, chat_type, owner_id, policy_mode,
-                       meta_delete, meta_kick, is_active, whitelist, moderator_channel_id,
-                       created_at, updated_at
-                FROM chat_configs
-                WHERE chat_id = %s
-                """,
-                (chat_id,),
-            )
+        with self._cache_lock:
+            cached = self._cache.get(chat_id)
+        if cached is not None:
+            # Копия: хэндлеры мутируют поля конфига перед update(),
+            # кэшированный экземпляр не должен впитывать эти правки
+            return _config_copy(cached)
+
+        with self._tuple_cursor() as cur:
+            cur.execute("EXECUTE get_chat_config (%s)", (chat_id,))
             row = cur.fetchone()
 
         if not row:
             return None
 
-        return ChatConfig(
-            chat_id=row["chat_id"],
-            chat_title=row["chat_title"],
-            chat_type=row["chat_type"],
-            owner_id=row["owner_id"],
-            policy_mode=row["policy_mode"],
-            meta_delete=row["meta_delete"],
-            meta_kick=row["meta_kick"],
-            is_active=row["is_active"],
-            whitelist=json.loads(row["whitelist"]) if row["whitelist"] else None,
-            moderator_channel_id=row["moderator_channel_id"],
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
-        )
+        config = ChatConfig(*row)
+        with self._cache_lock:
+            self._cache[chat_id] = config
+        return _config_copy(config)
 
     def get_by_owner_id(self, owner_id: int) -> Sequence[ChatConfig]:
-        with self._cursor() as cur:
+        with self._tuple_cursor() as cur:
             cur.execute(
                 """
                 SELECT chat_id, chat_title, chat_type, owner_id, policy_mode,
@@ -388,27 +536,12 @@ class _ChatConfigStore(_PostgresRepoBase, ChatConfigStore):
             )
             rows = cur.fetchall()
 
-        return [
-            ChatConfig(
-                chat_id=row["chat_id"],
-                chat_title=row["chat_title"],
-                chat_type=row["chat_type"],
-                owner_id=row["owner_id"],
-                policy_mode=row["policy_mode"],
-                meta_delete=row["meta_delete"],
-                meta_kick=row["meta_kick"],
-                is_active=row["is_active"],
-                whitelist=json.loads(row["whitelist"]) if row["whitelist"] else None,
-                moderator_channel_id=row["moderator_channel_id"],
-                created_at=row["created_at"],
-                updated_at=row["updated_at"],
-            )
-            for row in rows
-        ]
-    
+        _CC = ChatConfig
+        return [_CC(*row) for row in rows]
+
     def get_by_moderator_channel_id(self, channel_id: int) -> Sequence[ChatConfig]:
         """Найти все чаты, использующие этот канал как модераторский."""
-        with self._cursor() as cur:
+        with self._tuple_cursor() as cur:
             cur.execute(
                 """
                 SELECT chat_id, chat_title, chat_type, owner_id, policy_mode,
@@ -421,40 +554,45 @@ class _ChatConfigStore(_PostgresRepoBase, ChatConfigStore):
             )
             rows = cur.fetchall()
 
-        return [
-            ChatConfig(
-                chat_id=row["chat_id"],
-                chat_title=row["chat_title"],
-                chat_type=row["chat_type"],
-                owner_id=row["owner_id"],
-                policy_mode=row["policy_mode"],
-                meta_delete=row["meta_delete"],
-                meta_kick=row["meta_kick"],
-                is_active=row["is_active"],
-                whitelist=json.loads(row["whitelist"]) if row["whitelist"] else None,
-                moderator_channel_id=row["moderator_channel_id"],
-                created_at=row["created_at"],
-                updated_at=row["updated_at"],
-            )
-            for row in rows
-        ]
+        _CC = ChatConfig
+        return [_CC(*row) for row in rows]
     
     def was_moderator_channel(self, channel_id: int) -> bool:
         """Проверить, использовался ли этот ID как модераторский канал раньше."""
-        with self._cursor() as cur:
+        with self._tuple_cursor() as cur:
+            # LIMIT 1 вместо COUNT(*): Postgres останавливается на первом
+            # попадании — с индексом по moderator_channel_id это один probe
             cur.execute(
                 """
-                SELECT COUNT(*) as count
+                SELECT 1
                 FROM chat_configs
                 WHERE moderator_channel_id = %s
+                LIMIT 1
                 """,
                 (channel_id,),
             )
-            row = cur.fetchone()
-            return row["count"] > 0 if row else False
+            return cur.fetchone() is not None
+
+    def bulk_reset_moderator(self, channel_id: int) -> None:
+        """Отвязать модераторский канал у всех чатов одним запросом."""
+        with self._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE chat_configs
+                SET moderator_channel_id = NULL,
+                    policy_mode = 'delete_only',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE moderator_channel_id = %s
+                """,
+                (channel_id,),
+            )
+        # Затронутые chat_id известны только серверу — сбрасываем кэш целиком
+        with self._cache_lock:
+            self._cache.clear()
 
     def upsert(self, config: ChatConfigInput) -> None:
-        whitelist_json = json.dumps(config.whitelist) if config.whitelist else None
+        # orjson отдаёт bytes — колонка текстовая, поэтому decode()
+        whitelist_json = orjson.dumps(config.whitelist).decode() if config.whitelist else None
 
         with self._cursor() as cur:
             cur.execute(
@@ -476,19 +614,10 @@ class _ChatConfigStore(_PostgresRepoBase, ChatConfigStore):
                     moderator_channel_id = EXCLUDED.moderator_channel_id,
                     updated_at = CURRENT_TIMESTAMP
                 """,
-                (
-                    config.chat_id,
-                    config.chat_title,
-                    config.chat_type,
-                    config.owner_id,
-                    config.policy_mode,
-                    config.meta_delete,
-                    config.meta_kick,
-                    config.is_active,
-                    whitelist_json,
-                    config.moderator_channel_id,
-                ),
+                (*_CONFIG_HEAD_FIELDS(config), whitelist_json, config.moderator_channel_id),
             )
+        with self._cache_lock:
+            self._cache.pop(config.chat_id, None)
 
     def update(self, chat_id: int, **updates) -> None:
         if not updates:
@@ -496,7 +625,7 @@ class _ChatConfigStore(_PostgresRepoBase, ChatConfigStore):
 
         # Special handling for whitelist
         if "whitelist" in updates and updates["whitelist"] is not None:
-            updates["whitelist"] = json.dumps(updates["whitelist"])
+            updates["whitelist"] = orjson.dumps(updates["whitelist"]).decode()
 
         set_clauses = [f"{key} = %s" for key in updates]
         set_clauses.append("updated_at = CURRENT_TIMESTAMP")
@@ -511,10 +640,14 @@ class _ChatConfigStore(_PostgresRepoBase, ChatConfigStore):
                 """,
                 (*updates.values(), chat_id),
             )
+        with self._cache_lock:
+            self._cache.pop(chat_id, None)
 
     def delete(self, chat_id: int) -> None:
         with self._cursor() as cur:
             cur.execute("DELETE FROM chat_configs WHERE chat_id = %s", (chat_id,))
+        with self._cache_lock:
+            self._cache.pop(chat_id, None)
 
 
 class _ChatStatsStore(_PostgresRepoBase, ChatStatsStore):
@@ -532,68 +665,178 @@ class _ChatStatsStore(_PostgresRepoBase, ChatStatsStore):
 
         with self._cursor() as cur:
             cur.execute(
+                "EXECUTE increment_chat_stats (%s, %s, %s, %s, %s, %s)",
+                (
+                    chat_id,
+                    date_only,
+                    messages_processed,
+                    spam_detected,
+                    messages_deleted,
+                    users_banned,
+                ),
+            )
+
+    def increment_many(self, rows: Sequence[ChatDailyStatsInput]) -> None:
+        """
+        Применяет пачку инкрементов одним INSERT ... ON CONFLICT.
+
+        Дубликаты (chat_id, date) складываются в процессе до отправки,
+        поэтому VALUES-список минимален, а Postgres парсит statement
+        один раз на страницу вместо round-trip'а на каждый инкремент.
+        """
+        if not rows:
+            return
+
+        aggregated: dict[tuple[int, date], list[int]] = {}
+        for r in rows:
+            date_only = r.date.date() if isinstance(r.date, datetime) else r.date
+            acc = aggregated.get((r.chat_id, date_only))
+            if acc is None:
+                aggregated[(r.chat_id, date_only)] = [
+                    r.messages_processed, r.spam_detected,
+                    r.messages_deleted, r.users_banned,
+                ]
+            else:
+                acc[0] += r.messages_processed
+                acc[1] += r.spam_detected
+                acc[2] += r.messages_deleted
+                acc[3] += r.users_banned
+
+        with self._tuple_cursor() as cur:
+            self._execute_values(
+                cur,
                 """
                 INSERT INTO chat_daily_stats(
                     chat_id, date, messages_processed, spam_detected,
                     messages_deleted, users_banned
                 )
-                VALUES (%s, %s, %s, %s, %s, %s)
+                VALUES %s
                 ON CONFLICT(chat_id, date) DO UPDATE SET
                     messages_processed = chat_daily_stats.messages_processed + EXCLUDED.messages_processed,
                     spam_detected = chat_daily_stats.spam_detected + EXCLUDED.spam_detected,
                     messages_deleted = chat_daily_stats.messages_deleted + EXCLUDED.messages_deleted,
                     users_banned = chat_daily_stats.users_banned + EXCLUDED.users_banned
                 """,
-                (
-                    chat_id,
-                    date_only,
-                    messages_processed,
-                    spam_detected,
-                    messages_deleted,
-                    users_banned,
-                ),
+                [
+                    (chat_id, date_only, *counters)
+                    for (chat_id, date_only), counters in aggregated.items()
+                ],
             )
 
     def get_stats(self, chat_id: int, days: int = 7) -> Sequence[ChatDailyStats]:
-        with self._cursor() as cur:
+        with self._tuple_cursor() as cur:
             cur.execute(
                 """
                 SELECT id, chat_id, date, messages_processed, spam_detected,
                        messages_deleted, users_banned
                 FROM chat_daily_stats
-                WHERE chat_id = %s AND date >= CURRENT_DATE - INTERVAL '%s days'
+                WHERE chat_id = %s AND date >= CURRENT_DATE - make_interval(days => %s)
                 ORDER BY date DESC
                 """,
                 (chat_id, days),
             )
             rows = cur.fetchall()
 
-        return [
-            ChatDailyStats(
-                id=row["id"],
-                chat_id=row["chat_id"],
-                date=row["date"],
-                messages_processed=row["messages_processed"],
-                spam_detected=row["spam_detected"],
-                messages_deleted=row["messages_deleted"],
-                users_banned=row["users_banned"],
-            )
-            for row in rows
-        ]
+        _CDS = ChatDailyStats
+        return [_CDS(*row) for row in rows]
+
+
+def _copy_escape(value: str | None) -> str:
+    """Экранирует значение для текстового формата COPY (NULL — как \\N)."""
+    if value is None:
+        return "\\N"
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_field(value: Any) -> str:
+    """Поле произвольного типа в текстовый формат COPY (числа — как str)."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return _copy_escape(value)
+    return str(value)
 
 
 class _LogStore(_PostgresRepoBase):
+    # Самый горячий путь записи: write() — неблокирующий append в деку,
+    # фоновый поток раз в _FLUSH_INTERVAL сливает накопленное через COPY
+    # (самый дешёвый bulk-ingest в Postgres). JSON-кодирование контекста
+    # тоже уезжает в поток-сборщик. При переполнении деки старые записи
+    # вытесняются — лог-синк не имеет права тормозить обработку сообщений.
+    _FLUSH_INTERVAL = 0.5
+    _FLUSH_BATCH = 1000
+
+    def __init__(self, pool: ThreadedConnectionPool):
+        super().__init__(pool)
+        self._buffer: deque[tuple[str, str, str, dict | None]] = deque(maxlen=10000)
+        self._closed = Event()
+        self._flusher = Thread(target=self._flush_loop, name="log-flusher", daemon=True)
+        self._flusher.start()
+
     def write(self, level: str, logger: str, message: str, context: dict | None = None) -> None:
-        with self._cursor() as cur:
-            cur.execute(
+        self._buffer.append((level, logger, message, context))
+
+    def close(self) -> None:
+        """Останавливает поток-сборщик, синхронно дослив остаток буфера."""
+        self._closed.set()
+        self._flusher.join(timeout=5)
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self._FLUSH_INTERVAL):
+            self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        while True:
+            rows: list[tuple[str, str, str, dict | None]] = []
+            while self._buffer and len(rows) < self._FLUSH_BATCH:
+                try:
+                    rows.append(self._buffer.popleft())
+                except IndexError:
+                    break
+            if not rows:
+                return
+
+            buf = io.StringIO()
+            for level, logger, message, context in rows:
+                ctx = orjson.dumps(context).decode() if context else None
+                buf.write(
+                    "\t".join(_copy_escape(v) for v in (level, logger, message, ctx))
+                )
+                buf.write("\n")
+            buf.seek(0)
+            try:
+                with self._cursor() as cur:
+                    cur.copy_expert(
+                        "COPY log_events(level, logger, message, context) FROM STDIN",
+                        buf,
+                    )
+            except Exception:
+                # Недоступная БД не должна ронять поток-сборщик: пачка
+                # теряется, следующий цикл попробует слить новые записи
+                return
+
+            if len(rows) < self._FLUSH_BATCH:
+                return
+
+    def write_many(self, records: Sequence[tuple[str, str, str, dict | None]]) -> None:
+        """Синхронно пишет пачку лог-записей одним INSERT, минуя буфер."""
+        if not records:
+            return
+        with self._tuple_cursor() as cur:
+            self._execute_values(
+                cur,
                 """
                 INSERT INTO log_events(level, logger, message, context)
-                VALUES (%s, %s, %s, %s)
+                VALUES %s
                 """,
-                (
-                    level,
-                    logger,
-                    message,
-                    json.dumps(context) if context else None,
-                ),
+                [
+                    (level, logger, message, orjson.dumps(context).decode() if context else None)
+                    for level, logger, message, context in records
+                ],
             )
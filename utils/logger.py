@@ -12,11 +12,13 @@ utils/logger.py
 
 from __future__ import annotations
 
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import Optional
 
 from config.config import settings
 
@@ -28,20 +30,27 @@ LOG_FMT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
 DATE_FMT = "%Y-%m-%d %H:%M:%S"
 LOG_LEVEL = getattr(logging, settings.LOG_LEVEL, logging.INFO)
 _ROOT_LOGGER_INITIALIZED = False
+_INIT_LOCK = threading.Lock()
 
 def _init_root_logger() -> None:
-    """????????? root-?????? ?????? ???? ???."""
+    """Настроить root-логгер ровно один раз (double-checked под локом)."""
     global _ROOT_LOGGER_INITIALIZED
     if _ROOT_LOGGER_INITIALIZED:
         return
+    with _INIT_LOCK:
+        if _ROOT_LOGGER_INITIALIZED:
+            return
+        _configure_root()
+        _ROOT_LOGGER_INITIALIZED = True
 
+
+def _configure_root() -> None:
     root = logging.getLogger()
     if not root.handlers:
         root.setLevel(LOG_LEVEL)
 
         console = logging.StreamHandler(sys.stdout)
         console.setFormatter(logging.Formatter(LOG_FMT, DATE_FMT))
-        root.addHandler(console)
 
         file_handler = RotatingFileHandler(
             LOG_DIR / "bot.log",
@@ -50,20 +59,27 @@ def _init_root_logger() -> None:
             encoding="utf-8",
         )
         file_handler.setFormatter(logging.Formatter(LOG_FMT, DATE_FMT))
-        root.addHandler(file_handler)
 
-    _ROOT_LOGGER_INITIALIZED = True
+        # К root-логгеру цепляется только QueueHandler: logger.info(...) в
+        # async-хэндлерах стоит один put в SimpleQueue, а дисковый I/O и
+        # ротация файла уходят в фоновый поток QueueListener'а
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(QueueHandler(log_queue))
+
+        listener = QueueListener(
+            log_queue, console, file_handler, respect_handler_level=True
+        )
+        listener.start()
+        atexit.register(listener.stop)
 
 
-def get_logger(name: Optional[str] = None) -> logging.Logger:
-    """
-    Возвратить именованный логгер (или root, если name не указан).
-    Использование:
-        logger = get_logger(__name__)
-        logger.info("Hello!")
-    """
-    _init_root_logger()
-    return logging.getLogger(name or "root")
+# Root-логгер настраивается на импорте модуля: get_logger становится
+# прямым псевдонимом logging.getLogger — без вызова-обёртки и проверки
+# флага на каждом логирующем месте. Использование прежнее:
+#     logger = get_logger(__name__)
+#     logger.info("Hello!")
+_init_root_logger()
+get_logger = logging.getLogger
 
 
 __all__ = ["get_logger"]